@@ -0,0 +1,219 @@
+import os
+import json
+import itertools
+import logging
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from zipfile import BadZipFile, ZipFile
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Peak memory of a python-docx conversion per byte of word/document.xml. The parsed
+# tree dominates; bench_suite banks of 2k-30k exercises measured 12.3-13x.
+DOCUMENT_XML_MEMORY_FACTOR = 13
+
+# Word parts compress about 10-50x; deflate tops out near 1030x. Parts under
+# RATIO_CHECK_MIN_BYTES are too small to matter whatever their ratio.
+MAX_COMPRESSION_RATIO = 200
+RATIO_CHECK_MIN_BYTES = 1024 * 1024
+MAX_UNCOMPRESSED_BYTES = 1024 * 1024 * 1024
+MAX_ZIP_MEMBERS = 10_000
+
+# What a conversion of one upload is expected to cost, from its zip directory
+DocumentCost = namedtuple('DocumentCost',
+                          ['compressed_bytes', 'uncompressed_bytes', 'document_xml_bytes', 'memory_bytes'])
+
+class InvalidDocument(ValueError):
+    """Raised when an upload is not a .docx zip with a word/document.xml part"""
+
+
+class DocumentTooLarge(ValueError):
+    """Raised when an upload would inflate beyond the limits (e.g. a zip bomb) or the memory budget"""
+
+
+class AdmissionTimeout(Exception):
+    """Raised when a conversion could not be admitted before its queueing time ran out"""
+
+
+def check_zip_members(members, max_uncompressed_bytes=MAX_UNCOMPRESSED_BYTES, max_ratio=MAX_COMPRESSION_RATIO):
+    """Raise ``DocumentTooLarge`` if zip members would inflate like a zip bomb; returns their total size.
+
+    Takes ``ZipInfo`` entries, so nothing is decompressed to check them.
+    """
+    if len(members) > MAX_ZIP_MEMBERS:
+        raise DocumentTooLarge(f"Archive has {len(members):,} members, more than the {MAX_ZIP_MEMBERS:,} allowed")
+    for member in members:
+        if member.file_size >= RATIO_CHECK_MIN_BYTES and member.file_size > max_ratio * max(member.compress_size, 1):
+            raise DocumentTooLarge(f"{member.filename} expands {member.file_size / max(member.compress_size, 1):,.0f}x "
+                                   f"when decompressed, more than the {max_ratio}x allowed")
+    uncompressed_bytes = sum(member.file_size for member in members)
+    if uncompressed_bytes > max_uncompressed_bytes:
+        raise DocumentTooLarge(f"Archive expands to {uncompressed_bytes / 1e6:,.0f} MB, more than the "
+                               f"{max_uncompressed_bytes / 1e6:,.0f} MB allowed")
+    return uncompressed_bytes
+
+def estimate_cost(source, max_uncompressed_bytes=MAX_UNCOMPRESSED_BYTES, max_ratio=MAX_COMPRESSION_RATIO):
+    """Estimate the memory needed to convert a .docx path or seekable file from its zip directory.
+
+    Only the central directory is read and nothing is decompressed. zipfile
+    stops every member at the size its directory entry declares, so those
+    sizes bound what parsing can inflate to. Raises ``InvalidDocument`` or,
+    for zip-bomb-like uploads, ``DocumentTooLarge``.
+    """
+    if hasattr(source, 'read'):
+        compressed_bytes = source.seek(0, os.SEEK_END)
+        source.seek(0)
+    else:
+        compressed_bytes = os.path.getsize(source)
+
+    try:
+        with ZipFile(source) as docx_zip:
+            members = docx_zip.infolist()
+    except BadZipFile:
+        raise InvalidDocument("Not a valid .docx file")
+    finally:
+        if hasattr(source, 'read'):
+            source.seek(0)
+
+    document_xml = next((member for member in members if member.filename == 'word/document.xml'), None)
+    if document_xml is None:
+        raise InvalidDocument("Not a valid .docx file: word/document.xml is missing")
+    uncompressed_bytes = check_zip_members(members, max_uncompressed_bytes, max_ratio)
+
+    memory_bytes = compressed_bytes + document_xml.file_size * DOCUMENT_XML_MEMORY_FACTOR
+    return DocumentCost(compressed_bytes, uncompressed_bytes, document_xml.file_size, memory_bytes)
+
+
+def process_exists(pid):
+    """Whether the process with this pid is still running"""
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except (ProcessLookupError, PermissionError):
+        # PermissionError: the pid was reused by another user's process
+        return False
+    return True
+
+
+class AdmissionController:
+    """Caps the estimated memory of the conversions in flight at ``budget_bytes``.
+
+    Conversions are admitted in arrival order, so a large one is not starved
+    by a stream of small ones. One that does not fit waits up to
+    ``queue_seconds`` for earlier conversions to finish, then gets
+    ``AdmissionTimeout``; one larger than the whole budget is rejected with
+    ``DocumentTooLarge`` straight away.
+
+    Reservations are kept in a JSON ledger at ``ledger_path``, locked with
+    ``flock``, so every process using that file shares one budget. When the
+    controller is created before a pre-forking server forks its workers,
+    they all use the ledger it created. Reservations and places in line held
+    by processes that have exited are dropped. Without fcntl (Windows) the
+    budget is per process.
+    """
+
+    def __init__(self, budget_bytes, queue_seconds=10, ledger_path=None, poll_seconds=0.05):
+        self.budget_bytes = budget_bytes
+        self.queue_seconds = queue_seconds
+        self.poll_seconds = poll_seconds
+        self.ledger_path = ledger_path or os.path.join(tempfile.mkdtemp(prefix='admission_'), 'ledger.json')
+        self.tickets = itertools.count()
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.budget_bytes > 0
+
+    @contextmanager
+    def _ledger(self):
+        """Yield the ledger locked against other threads and processes, and save it afterwards"""
+        with self.lock, open(self.ledger_path, 'a+') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            content = f.read()
+            try:
+                ledger = json.loads(content) if content else None
+            except ValueError:
+                # A worker killed while writing leaves a partial ledger behind
+                logger.warning(f"Resetting unreadable admission ledger {self.ledger_path}")
+                ledger = None
+            if ledger is None:
+                ledger = {'entries': [], 'admitted': 0, 'rejected': 0, 'timed_out': 0}
+            # Entries are [ticket, pid, cost_bytes, admitted] in arrival order
+            ledger['entries'] = [entry for entry in ledger['entries'] if process_exists(entry[1])]
+            yield ledger
+            f.seek(0)
+            f.truncate()
+            json.dump(ledger, f)
+
+    def check(self, cost_bytes):
+        """Raise ``DocumentTooLarge`` if ``cost_bytes`` can never fit in the budget"""
+        if cost_bytes > self.budget_bytes:
+            with self._ledger() as ledger:
+                ledger['rejected'] += 1
+            raise DocumentTooLarge(f"Document needs about {cost_bytes / 1e6:,.0f} MB to convert, more than the "
+                                   f"{self.budget_bytes / 1e6:,.0f} MB this server allows")
+
+    def acquire(self, cost_bytes, queue_seconds=None):
+        """Block until ``cost_bytes`` fit in the budget, then reserve them; returns the reservation ticket"""
+        self.check(cost_bytes)
+        ticket = f"{os.getpid()}-{next(self.tickets)}"
+        deadline = time.monotonic() + (self.queue_seconds if queue_seconds is None else queue_seconds)
+        while True:
+            with self._ledger() as ledger:
+                entries = ledger['entries']
+                entry = next((entry for entry in entries if entry[0] == ticket), None)
+                if entry is None:
+                    entry = [ticket, os.getpid(), cost_bytes, False]
+                    entries.append(entry)
+                in_flight_bytes = sum(other[2] for other in entries if other[3])
+                first_waiting = next(other for other in entries if not other[3])
+                if first_waiting is entry and in_flight_bytes + cost_bytes <= self.budget_bytes:
+                    entry[3] = True
+                    ledger['admitted'] += 1
+                    return ticket
+                timed_out = time.monotonic() >= deadline
+                if timed_out:
+                    entries.remove(entry)
+                    ledger['timed_out'] += 1
+                    in_flight = sum(1 for other in entries if other[3])
+            if timed_out:
+                raise AdmissionTimeout(f"{in_flight} conversions are using the memory budget")
+            time.sleep(self.poll_seconds)
+
+    def release(self, ticket):
+        with self._ledger() as ledger:
+            ledger['entries'] = [entry for entry in ledger['entries'] if entry[0] != ticket]
+
+    @contextmanager
+    def admit(self, cost_bytes, queue_seconds=None):
+        ticket = self.acquire(cost_bytes, queue_seconds)
+        try:
+            yield
+        finally:
+            self.release(ticket)
+
+    def stats(self):
+        with self._ledger() as ledger:
+            admitted = [entry for entry in ledger['entries'] if entry[3]]
+            return {
+                'budget_bytes': self.budget_bytes,
+                'in_flight': len(admitted),
+                'in_flight_bytes': sum(entry[2] for entry in admitted),
+                'waiting': len(ledger['entries']) - len(admitted),
+                'admitted': ledger['admitted'],
+                'rejected': ledger['rejected'],
+                'timed_out': ledger['timed_out'],
+            }
@@ -1,38 +1,304 @@
+import io
 import os
+import hmac
+import time
+import uuid
 import logging
-from flask import Flask, render_template, request, send_file, flash, redirect, url_for
+from flask import (Flask, Request, Response, abort, flash, g, jsonify, redirect, render_template, request,
+                   send_file, url_for)
 from werkzeug.utils import secure_filename
-from converter import convert_word_to_excel, create_text_files
+from werkzeug.wsgi import ClosingIterator
+from converter import (CONVERSION_MODES, EX_DATA_COLUMNS, OUTPUT_FORMATS, available_output_formats, build_code_zip,
+                       convert_document, extract_code_blocks_from_docx, write_code_zip, write_mode_workbooks_zip)
+from admission import AdmissionController, AdmissionTimeout, DocumentTooLarge, InvalidDocument, estimate_cost
+from jobs import JobQueue, JobQueueFull
+from batch import DuplicateExidError, convert_batch, extract_docx_files_from_zip
+from cache import BlockCache, ResultCache, result_cache_key
+from metrics import render_metrics, stage, start_timings, stop_timings
+from profiling import ProfilerBusy, profile_call
+from validation import validate_document
+import shutil
 import tempfile
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+class SpooledRequest(Request):
+    """Request that keeps uploads in memory up to UPLOAD_SPOOL_MAX_BYTES before spilling to disk"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=app.config['UPLOAD_SPOOL_MAX_BYTES'], mode='rb+')
+
 # Initialize Flask app
 app = Flask(__name__, template_folder='templates', static_folder='static')
 app.secret_key = os.environ.get("SESSION_SECRET", "default-secret-key")
+app.request_class = SpooledRequest
 
 # Configure upload settings
 ALLOWED_EXTENSIONS = {'docx'}
+app.config['UPLOAD_SPOOL_MAX_BYTES'] = int(os.environ.get("UPLOAD_SPOOL_MAX_BYTES", 16 * 1024 * 1024))
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get("MAX_UPLOAD_BYTES", 64 * 1024 * 1024))
+
+# Admission control: estimated conversion memory allowed in flight across all worker
+# processes and background jobs (ADMISSION_MEMORY_BYTES=0 disables it), and how long
+# a conversion may queue for room
+admission = AdmissionController(
+    budget_bytes=int(os.environ.get("ADMISSION_MEMORY_BYTES", 2 * 1024 * 1024 * 1024)),
+    queue_seconds=float(os.environ.get("ADMISSION_QUEUE_SECONDS", 10)),
+)
+
+# Background conversion settings
+job_queue = JobQueue(
+    max_workers=int(os.environ.get("CONVERSION_WORKERS", 2)),
+    max_pending=int(os.environ.get("CONVERSION_QUEUE_SIZE", 16)),
+    ttl=int(os.environ.get("JOB_TTL_SECONDS", 3600)),
+    max_runtime=int(os.environ.get("JOB_MAX_SECONDS", 3600)),
+    admission=admission,
+)
+
+# Conversion result cache settings (RESULT_CACHE_MAX_BYTES=0 disables it)
+result_cache = ResultCache(
+    os.environ.get("RESULT_CACHE_DIR", os.path.join(tempfile.gettempdir(), 'word_converter_cache')),
+    max_bytes=int(os.environ.get("RESULT_CACHE_MAX_BYTES", 256 * 1024 * 1024)),
+    ttl=int(os.environ.get("RESULT_CACHE_TTL_SECONDS", 24 * 3600)),
+)
+
+# Parsed exid blocks kept for incremental re-conversion (off unless BLOCK_CACHE_MAX_BYTES is set)
+block_cache = BlockCache(max_bytes=int(os.environ.get("BLOCK_CACHE_MAX_BYTES", 0)))
+
+# Upload validation settings (VALIDATE_UPLOADS=0 disables it)
+app.config['VALIDATE_UPLOADS'] = os.environ.get("VALIDATE_UPLOADS", "1") == "1"
+app.config['VALIDATION_MAX_ERRORS'] = int(os.environ.get("VALIDATION_MAX_ERRORS", 20))
+
+# Database that /load writes ex_data and qa_data into, e.g. postgresql://... or sqlite:///exercises.db
+app.config['DATABASE_URL'] = os.environ.get("DATABASE_URL", "")
+
+# On-demand profiling: PROFILING=1 lets any request ask for it with profile=1; otherwise the
+# request must send PROFILE_TOKEN in X-Profile-Token. PROFILE_DIR also keeps a copy of each profile.
+app.config['PROFILING_ENABLED'] = os.environ.get("PROFILING", "0") == "1"
+app.config['PROFILE_TOKEN'] = os.environ.get("PROFILE_TOKEN", "")
+app.config['PROFILE_DIR'] = os.environ.get("PROFILE_DIR", "")
+
+# Uploads whose parts expand beyond this are rejected before parsing
+app.config['MAX_UNCOMPRESSED_BYTES'] = int(os.environ.get("MAX_UNCOMPRESSED_BYTES", 1024 * 1024 * 1024))
+
+# Validation issues listed in a flash message before the rest are summarized
+FLASHED_ISSUES = 5
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def requested_modes():
+    """Conversion modes named by the ``mode`` field, repeated or comma-separated; defaults to reader"""
+    modes = [mode.strip().lower() for value in request.values.getlist('mode')
+             for mode in value.split(',') if mode.strip()]
+    unknown = [mode for mode in modes if mode not in CONVERSION_MODES]
+    if unknown:
+        raise ValueError(f"Unknown conversion mode: {', '.join(unknown)}")
+    return list(dict.fromkeys(modes)) or ['reader']
+
+def requested_format():
+    """Output format named by the ``format`` field; defaults to xlsx"""
+    output_format = request.values.get('format', 'xlsx').strip().lower() or 'xlsx'
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}")
+    if output_format not in available_output_formats():
+        raise ValueError(f"{output_format} output is not available on this server")
+    return output_format
+
+def find_document_issues(upload, modes):
+    """Run the early validation pass over an uploaded stream and rewind it for conversion"""
+    issues = validate_document(upload, modes, max_errors=app.config['VALIDATION_MAX_ERRORS'])
+    upload.seek(0)
+    return issues
+
+def flash_issues(issues):
+    for issue in issues[:FLASHED_ISSUES]:
+        location = f"Paragraph {issue.paragraph}" + (f" ({issue.exid})" if issue.exid else "")
+        flash(f'{location}: {issue.message}', 'error')
+    if len(issues) > FLASHED_ISSUES:
+        flash(f'...and {len(issues) - FLASHED_ISSUES} more problems. Please fix the document and upload it again.', 'error')
+
+def wants_profile():
+    """Whether the client asked for the conversion to be profiled"""
+    return request.values.get('profile', '').lower() in ('1', 'true', 'on', 'yes')
+
+def profiling_allowed():
+    if app.config['PROFILING_ENABLED']:
+        return True
+    token = app.config['PROFILE_TOKEN']
+    return bool(token) and hmac.compare_digest(request.headers.get('X-Profile-Token', ''), token)
+
+def send_profiled(convert, download_name):
+    """Run ``convert(output)`` under the profiler and send a zip of its result and profile"""
+    output = io.BytesIO()
+    try:
+        _, report = profile_call(convert, output)
+    except ProfilerBusy as e:
+        response = jsonify(error=f'{str(e)}. Please retry shortly.')
+        response.status_code = 503
+        response.headers['Retry-After'] = '5'
+        return response
+
+    bundle = io.BytesIO()
+    report.write_zip(bundle, [(download_name, output.getvalue())])
+    profile_name = f"{os.path.splitext(download_name)[0]}_profile.zip"
+    if app.config['PROFILE_DIR']:
+        os.makedirs(app.config['PROFILE_DIR'], exist_ok=True)
+        path = os.path.join(app.config['PROFILE_DIR'],
+                            f"{time.strftime('%Y%m%d-%H%M%S')}_{uuid.uuid4().hex[:8]}_{profile_name}")
+        with open(path, 'wb') as f:
+            f.write(bundle.getvalue())
+        logger.info(f"Stored profile at {path}")
+    logger.info(f"Profiled conversion of {download_name} in {report.seconds:.2f}s")
+
+    bundle.seek(0)
+    return send_file(bundle, as_attachment=True, download_name=profile_name, mimetype='application/zip')
+
+def wants_async():
+    """Whether the client asked for a background job instead of an inline download"""
+    return request.values.get('async', '').lower() in ('1', 'true', 'on', 'yes')
+
+def submit_job(kind, file, download_name, modes=('reader',), output_format='xlsx'):
+    """Queue a conversion and answer with its job id and polling URLs"""
+    try:
+        job = job_queue.submit(kind, file, download_name, modes, output_format)
+    except JobQueueFull as e:
+        logger.warning(f"Rejected {kind} job: {str(e)}")
+        response = jsonify(error='Too many conversions in progress. Please retry shortly.')
+        response.status_code = 503
+        response.headers['Retry-After'] = '5'
+        return response
+
+    return jsonify(
+        job_id=job.id,
+        status=job.status,
+        status_url=url_for('job_status', job_id=job.id),
+        result_url=url_for('job_result', job_id=job.id),
+    ), 202
+
+@app.before_request
+def reject_oversized_uploads():
+    """Refuse bodies over MAX_CONTENT_LENGTH before a route starts reading them"""
+    if request.content_length and request.content_length > app.config['MAX_CONTENT_LENGTH']:
+        abort(413)
+
+# Routes whose conversions are timed per stage for /metrics and the Server-Timing header
+TIMED_ENDPOINTS = {'upload_file', 'extract_code_files', 'batch_convert', 'load_upload', 'validate_upload'}
+
+@app.before_request
+def start_stage_timings():
+    if request.endpoint not in TIMED_ENDPOINTS:
+        return
+    g.timings, g.timings_token = start_timings(request.content_length or 0)
+    # Parsing the multipart body is what spools the upload
+    with g.timings.stage('upload_save'):
+        request.files
+
+# Routes that can run their conversion under the profiler
+PROFILED_ENDPOINTS = {'upload_file', 'extract_code_files'}
+
+# Registered after start_stage_timings, since reading request.values parses the body
+@app.before_request
+def check_profile_access():
+    if request.endpoint in PROFILED_ENDPOINTS and wants_profile() and not profiling_allowed():
+        return jsonify(error='Profiling is not enabled for this request'), 403
+
+@app.after_request
+def add_server_timing(response):
+    timings = g.get('timings')
+    if timings is None:
+        return response
+    response.headers['Server-Timing'] = timings.server_timing()
+    # The body is sent after this hook returns, so sending only shows up in /metrics
+    send_started = time.perf_counter()
+    def record_send():
+        timings.add('response_send', time.perf_counter() - send_started)
+    if response.direct_passthrough:
+        # File bodies from send_file bypass the response's close callbacks
+        response.response = ClosingIterator(response.response, record_send)
+    else:
+        response.call_on_close(record_send)
+    return response
+
+# Routes whose conversions are admitted against the memory budget
+ADMITTED_ENDPOINTS = {'upload_file', 'extract_code_files'}
+
+def reject_upload(message, status_code):
+    if wants_async():
+        return jsonify(error=message), status_code
+    flash(message, 'error')
+    return redirect(url_for('index'))
+
+@app.before_request
+def admit_conversion():
+    """Reject zip bombs, then hold a conversion back until it fits in the memory budget"""
+    if request.endpoint not in ADMITTED_ENDPOINTS:
+        return
+    file = request.files.get('file')
+    if file is None or not allowed_file(file.filename):
+        # The route reports the missing or invalid file
+        return
+
+    try:
+        cost = estimate_cost(file.stream, max_uncompressed_bytes=app.config['MAX_UNCOMPRESSED_BYTES'])
+    except InvalidDocument as e:
+        logger.warning(f"Rejected {file.filename}: {str(e)}")
+        return reject_upload(f'{str(e)}.', 400)
+    except DocumentTooLarge as e:
+        logger.warning(f"Rejected {file.filename}: {str(e)}")
+        return reject_upload(f'{str(e)}.', 413)
+
+    if not admission.enabled:
+        return
+    try:
+        if wants_async():
+            # Background jobs wait for room when they start, not while the request is open
+            admission.check(cost.memory_bytes)
+            return
+        with stage('admission_wait'):
+            g.admission_ticket = admission.acquire(cost.memory_bytes)
+    except DocumentTooLarge as e:
+        logger.warning(f"Rejected {file.filename}: {str(e)}")
+        return reject_upload(f'{str(e)}.', 413)
+    except AdmissionTimeout as e:
+        logger.warning(f"Turned away {file.filename}: {str(e)}")
+        response = jsonify(error='Too many conversions in progress. Please retry shortly.')
+        response.status_code = 503
+        response.headers['Retry-After'] = '5'
+        return response
+
+@app.teardown_request
+def release_admission(exc):
+    ticket = g.pop('admission_ticket', None)
+    if ticket is not None:
+        admission.release(ticket)
+
+@app.teardown_request
+def stop_stage_timings(exc):
+    token = g.pop('timings_token', None)
+    if token is not None:
+        stop_timings(token)
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    limit_mb = app.config['MAX_CONTENT_LENGTH'] / (1024 * 1024)
+    logger.warning(f"Rejected upload larger than {limit_mb:.0f} MB")
+    flash(f'File too large. The maximum upload size is {limit_mb:.0f} MB.', 'error')
+    return redirect(url_for('index'))
+
 @app.route('/')
 def index():
     logger.debug("Accessing index route")
     try:
-        return render_template('index.html')
+        return render_template('index.html', output_formats=available_output_formats())
     except Exception as e:
         logger.error(f"Error rendering template: {str(e)}", exc_info=True)
         return "Error loading page", 500
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
-    temp_input = None
-    temp_output = None
-
     try:
         if 'file' not in request.files:
             flash('No file part', 'error')
@@ -47,25 +313,86 @@ def upload_file():
             flash('Invalid file type. Please upload a .docx file', 'error')
             return redirect(url_for('index'))
 
-        # Create temporary files for processing
-        temp_input = tempfile.NamedTemporaryFile(delete=False, suffix='.docx')
-        file.save(temp_input.name)
-        temp_output = tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx')
+        try:
+            modes = requested_modes()
+        except ValueError as e:
+            flash(f'{str(e)}. Choose from: {", ".join(CONVERSION_MODES)}', 'error')
+            return redirect(url_for('index'))
+        try:
+            output_format = requested_format()
+        except ValueError as e:
+            flash(f'{str(e)}. Choose from: {", ".join(available_output_formats())}', 'error')
+            return redirect(url_for('index'))
+
+        # Several modes are converted from one parse and returned as a zip of one output per mode
+        name = os.path.splitext(secure_filename(file.filename))[0]
+        multiple = len(modes) > 1
+        if multiple:
+            kind, download_name, mimetype = 'modes', f"{name}_modes.zip", 'application/zip'
+        else:
+            kind, download_name = 'excel', f"{name}{OUTPUT_FORMATS[output_format].suffix}"
+            mimetype = OUTPUT_FORMATS[output_format].mimetype
 
-        # Convert the file
-        logger.info(f"Converting file: {file.filename}")
-        success = convert_word_to_excel(temp_input.name, temp_output.name)
+        # Parse straight from the spooled upload stream
+        upload = file.stream
 
-        if not success:
-            flash('Error converting file. Please check the document format.', 'error')
-            return redirect(url_for('index'))
+        # Serve identical uploads from the result cache before validating or parsing them;
+        # zip member names include the upload name, so it is part of the multi-mode key.
+        # A profiled or async conversion always runs, bypassing the result and block caches.
+        cache_key = None
+        if result_cache.enabled and not wants_profile() and not wants_async():
+            cache_key = result_cache_key(upload, '+'.join(modes),
+                                         f"{output_format}_zip-{name}" if multiple else output_format)
+        output = result_cache.get(cache_key) if cache_key else None
+
+        if output is not None:
+            logger.info(f"Serving cached conversion for: {file.filename}")
+        else:
+            # Reject documents that would silently lose rows before converting them
+            if app.config['VALIDATE_UPLOADS']:
+                issues = find_document_issues(upload, modes)
+                if issues:
+                    logger.warning(f"Rejected {file.filename}: {len(issues)} validation issues")
+                    if wants_async():
+                        return jsonify(error='Document failed validation',
+                                       issues=[issue._asdict() for issue in issues]), 422
+                    flash_issues(issues)
+                    return redirect(url_for('index'))
+
+            if wants_profile():
+                if multiple:
+                    return send_profiled(lambda output: write_mode_workbooks_zip(
+                        upload, modes, output, name, output_format=output_format), download_name)
+                return send_profiled(lambda output: convert_document(
+                    upload, output, output_format, mode=modes[0]), download_name)
+
+            if wants_async():
+                return submit_job(kind, file, download_name, modes, output_format)
+
+            # Convert the file in memory, or into a zip of one output per mode
+            logger.info(f"Converting file: {file.filename} ({', '.join(modes)} mode, {output_format})")
+            output = io.BytesIO()
+            if multiple:
+                write_mode_workbooks_zip(upload, modes, output, name, output_format=output_format)
+                success = True
+            else:
+                success = convert_document(upload, output, output_format, mode=modes[0],
+                                           block_cache=block_cache if block_cache.enabled else None)
+
+            if not success:
+                flash('Error converting file. Please check the document format.', 'error')
+                return redirect(url_for('index'))
+
+            if cache_key:
+                result_cache.put_bytes(cache_key, output.getvalue())
+            output.seek(0)
 
         # Send the converted file
         return send_file(
-            temp_output.name,
+            output,
             as_attachment=True,
-            download_name=f"{os.path.splitext(secure_filename(file.filename))[0]}.xlsx",
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            download_name=download_name,
+            mimetype=mimetype
         )
 
     except Exception as e:
@@ -73,21 +400,8 @@ def upload_file():
         flash('Error converting file. Please try again.', 'error')
         return redirect(url_for('index'))
 
-    finally:
-        # Cleanup temporary files
-        try:
-            if temp_input and os.path.exists(temp_input.name):
-                os.unlink(temp_input.name)
-            if temp_output and os.path.exists(temp_output.name):
-                os.unlink(temp_output.name)
-        except Exception as e:
-            logger.error(f"Error cleaning up temporary files: {str(e)}")
-
 @app.route('/extract-code', methods=['POST'])
 def extract_code_files():
-    temp_input = None
-    zip_path = None
-
     try:
         if 'file' not in request.files:
             flash('No file part', 'error')
@@ -102,16 +416,31 @@ def extract_code_files():
             flash('Invalid file type. Please upload a .docx file', 'error')
             return redirect(url_for('index'))
 
-        # Create temporary file for processing
-        temp_input = tempfile.NamedTemporaryFile(delete=False, suffix='.docx')
-        file.save(temp_input.name)
+        if wants_profile():
+            return send_profiled(lambda output: write_code_zip(extract_code_blocks_from_docx(file.stream), output),
+                                 f"{os.path.splitext(secure_filename(file.filename))[0]}_code_files.zip")
 
-        # Extract code files
-        zip_path = create_text_files(temp_input.name)
+        if wants_async():
+            return submit_job('code', file, f"{os.path.splitext(secure_filename(file.filename))[0]}_code_files.zip")
+
+        # Parse straight from the spooled upload stream
+        upload = file.stream
+
+        # Serve identical uploads from the result cache
+        cache_key = result_cache_key(upload, 'code', 'code_zip') if result_cache.enabled else None
+        output = result_cache.get(cache_key) if cache_key else None
+
+        if output is not None:
+            logger.info(f"Serving cached code files for: {file.filename}")
+        else:
+            # Extract code files into an in-memory zip private to this request
+            output = build_code_zip(upload)
+            if cache_key:
+                result_cache.put_bytes(cache_key, output.getvalue())
 
         # Send the zip file
         return send_file(
-            zip_path,
+            output,
             as_attachment=True,
             download_name=f"{os.path.splitext(secure_filename(file.filename))[0]}_code_files.zip",
             mimetype='application/zip'
@@ -122,15 +451,169 @@ def extract_code_files():
         flash('Error extracting code files. Please try again.', 'error')
         return redirect(url_for('index'))
 
-    finally:
-        # Cleanup temporary files
+@app.route('/batch', methods=['POST'])
+def batch_convert():
+    work_dir = None
+
+    try:
+        files = [f for f in request.files.getlist('files') if f.filename]
+        if not files:
+            flash('No selected files', 'error')
+            return redirect(url_for('index'))
+
+        work_dir = tempfile.mkdtemp()
+        docx_paths = []
+        for file in files:
+            filename = secure_filename(file.filename) or 'upload'
+            if filename.lower().endswith('.zip'):
+                zip_path = os.path.join(work_dir, filename)
+                file.save(zip_path)
+                docx_paths.extend(extract_docx_files_from_zip(zip_path, tempfile.mkdtemp(dir=work_dir),
+                                                              app.config['MAX_UNCOMPRESSED_BYTES']))
+            elif allowed_file(filename):
+                docx_dir = tempfile.mkdtemp(dir=work_dir)
+                docx_path = os.path.join(docx_dir, filename)
+                file.save(docx_path)
+                docx_paths.append(docx_path)
+            else:
+                flash(f'Invalid file type: {file.filename}. Please upload .docx files or a .zip of them', 'error')
+                return redirect(url_for('index'))
+
+        merge = request.form.get('output', 'merged') != 'zip'
+        sort_by = [name.strip() for name in request.form.get('sort_by', '').split(',') if name.strip()]
+        unknown = [name for name in sort_by if name not in EX_DATA_COLUMNS]
+        if unknown:
+            flash(f"Unknown sort column: {', '.join(unknown)}", 'error')
+            return redirect(url_for('index'))
         try:
-            if temp_input and os.path.exists(temp_input.name):
-                os.unlink(temp_input.name)
-            if zip_path and os.path.exists(zip_path):
-                os.unlink(zip_path)
-        except Exception as e:
-            logger.error(f"Error cleaning up temporary files: {str(e)}")
+            mode = requested_modes()[0]
+            output_format = requested_format()
+        except ValueError as e:
+            flash(str(e), 'error')
+            return redirect(url_for('index'))
+        download_name = f"batch_output{OUTPUT_FORMATS[output_format].suffix}" if merge else 'batch_output.zip'
+        output_path = os.path.join(work_dir, download_name)
+        logger.info(f"Batch converting {len(docx_paths)} documents")
+        stats = convert_batch(docx_paths, output_path, merge=merge, mode=mode, sort_by=sort_by,
+                              max_workers=int(os.environ.get("BATCH_WORKERS", 0)) or None,
+                              output_format=output_format)
+
+        with open(output_path, 'rb') as f:
+            output = io.BytesIO(f.read())
+        response = send_file(
+            output,
+            as_attachment=True,
+            download_name=download_name,
+            mimetype=OUTPUT_FORMATS[output_format].mimetype if merge else 'application/zip'
+        )
+        response.headers['X-Documents-Per-Second'] = f"{stats['documents_per_second']:.2f}"
+        return response
+
+    except (DuplicateExidError, DocumentTooLarge, InvalidDocument) as e:
+        logger.error(f"Batch conversion error: {str(e)}")
+        flash(str(e), 'error')
+        return redirect(url_for('index'))
+
+    except Exception as e:
+        logger.error(f"Batch conversion error: {str(e)}", exc_info=True)
+        flash('Error converting files. Please try again.', 'error')
+        return redirect(url_for('index'))
+
+    finally:
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+@app.route('/validate', methods=['POST'])
+def validate_upload():
+    file = request.files.get('file')
+    if file is None or not allowed_file(file.filename):
+        return jsonify(error='Upload a .docx file in the "file" field'), 400
+
+    try:
+        modes = requested_modes()
+        max_errors = int(request.values.get('max_errors', app.config['VALIDATION_MAX_ERRORS']))
+        issues = validate_document(file.stream, modes, max_errors=max_errors)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    except Exception as e:
+        logger.error(f"Validation error: {str(e)}", exc_info=True)
+        return jsonify(error='Could not read the document. Is it a valid .docx file?'), 400
+
+    return jsonify(valid=not issues, issues=[issue._asdict() for issue in issues]), 200 if not issues else 422
+
+@app.route('/load', methods=['POST'])
+def load_upload():
+    if not app.config['DATABASE_URL']:
+        return jsonify(error='No database configured. Set DATABASE_URL to enable loading.'), 503
+
+    file = request.files.get('file')
+    if file is None or not allowed_file(file.filename):
+        return jsonify(error='Upload a .docx file in the "file" field'), 400
+
+    try:
+        mode = requested_modes()[0]
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    if app.config['VALIDATE_UPLOADS']:
+        issues = find_document_issues(file.stream, [mode])
+        if issues:
+            logger.warning(f"Rejected {file.filename}: {len(issues)} validation issues")
+            return jsonify(error='Document failed validation',
+                           issues=[issue._asdict() for issue in issues]), 422
+
+    # SQLAlchemy is only imported once loading is used
+    from database import load_document
+    try:
+        stats = load_document(file.stream, app.config['DATABASE_URL'], mode=mode)
+    except ValueError as e:
+        return jsonify(error=str(e)), 422
+    except Exception as e:
+        logger.error(f"Database load error: {str(e)}", exc_info=True)
+        return jsonify(error='Error loading the document into the database.'), 500
+
+    return jsonify(stats)
+
+@app.route('/metrics')
+def metrics():
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/cache/stats')
+def cache_stats():
+    return jsonify(result_cache.stats())
+
+@app.route('/admission/stats')
+def admission_stats():
+    return jsonify(admission.stats())
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify(error='Unknown or expired job'), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify(error='Unknown or expired job'), 404
+
+    if job.status == 'failed':
+        return jsonify(job.to_dict()), 500
+
+    if job.status != 'done':
+        response = jsonify(job.to_dict())
+        response.status_code = 202
+        response.headers['Retry-After'] = '1'
+        return response
+
+    return send_file(
+        job.output_path,
+        as_attachment=True,
+        download_name=job.download_name,
+        mimetype=job.mimetype
+    )
 
 if __name__ == "__main__":
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,205 @@
+import os
+import sys
+import logging
+import argparse
+import tempfile
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from zipfile import BadZipFile, ZipFile
+from admission import MAX_UNCOMPRESSED_BYTES, InvalidDocument, check_zip_members, estimate_cost
+from converter import (CONVERSION_MODES, OUTPUT_FORMATS, convert_document, exercise_table, extract_document_tables,
+                       open_writer, pool_context, question_table, sort_tables)
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+class DuplicateExidError(ValueError):
+    """Raised when a merged batch contains the same exid more than once"""
+
+    def __init__(self, duplicates):
+        self.duplicates = duplicates
+        listed = ', '.join(f"{exid} ({name})" for exid, name in duplicates[:10])
+        more = f" and {len(duplicates) - 10} more" if len(duplicates) > 10 else ""
+        super().__init__(f"Duplicate exid in batch: {listed}{more}")
+
+
+def extract_docx_files_from_zip(zip_path, dest_dir, max_uncompressed_bytes=MAX_UNCOMPRESSED_BYTES):
+    """Extract the .docx members of an uploaded zip into dest_dir and return their paths.
+
+    The archive is checked against the zip-bomb limits of ``admission`` before
+    anything is written, and raises ``DocumentTooLarge`` when it would inflate
+    past them.
+    """
+    paths = []
+    try:
+        archive = ZipFile(zip_path)
+    except BadZipFile:
+        raise InvalidDocument(f"Not a valid .zip file: {os.path.basename(zip_path)}")
+    with archive:
+        check_zip_members(archive.infolist(), max_uncompressed_bytes)
+        for member in archive.infolist():
+            # Flatten member paths so nothing can be written outside dest_dir
+            name = os.path.basename(member.filename)
+            if member.is_dir() or not name.lower().endswith('.docx') or name.startswith(('.', '~$')):
+                continue
+            target = os.path.join(dest_dir, _unique_name(dest_dir, name))
+            with archive.open(member) as src, open(target, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            paths.append(target)
+    return sorted(paths)
+
+def _unique_name(directory, name):
+    stem, ext = os.path.splitext(name)
+    candidate, n = name, 1
+    while os.path.exists(os.path.join(directory, candidate)):
+        n += 1
+        candidate = f"{stem}_{n}{ext}"
+    return candidate
+
+def _extract_tables(args):
+    docx_path, source, mode = args
+    return extract_document_tables(docx_path, source=source, mode=mode)
+
+def _convert_one(args):
+    docx_path, output_path, source, mode, output_format = args
+    convert_document(docx_path, output_path, output_format, source=source, mode=mode)
+    return output_path
+
+def _open_merged_writer(output_path, output_format, database_url):
+    if database_url:
+        # SQLAlchemy is only imported when loading into a database
+        from database import DatabaseWriter
+        return DatabaseWriter(database_url)
+    return open_writer(output_format, output_path)
+
+def convert_batch(docx_paths, output_path, merge=True, max_workers=None, source='docx', mode='reader',
+                  sort_by=(), output_format='xlsx', database_url=None):
+    """Convert many documents in parallel across CPU cores.
+
+    With ``merge`` the ex_data/qa_data rows of every document are concatenated,
+    in input order, into one output at ``output_path`` and exids must be unique
+    across the batch; ``sort_by`` names ex_data columns to order the merged
+    exercises by, with questions following their exercises. Otherwise
+    ``output_path`` is a zip of one output per document.
+    Every document is converted in the same ``mode`` and ``output_format``.
+    With ``database_url`` the merged rows are loaded into that database in one
+    transaction instead of being written to ``output_path``.
+    Every document is checked against the zip-bomb limits of ``admission``
+    before any is parsed.
+    Returns a dict of batch statistics including documents per second.
+    """
+    if not docx_paths:
+        raise ValueError("No .docx files to convert")
+    if database_url and not merge:
+        raise ValueError("Loading into a database merges every document; per-file output does not apply")
+    for path in docx_paths:
+        estimate_cost(path)
+
+    workers = min(len(docx_paths), max_workers or os.cpu_count() or 1)
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context()) as executor:
+        if merge:
+            # Sorting needs every row first; otherwise rows stream straight into the writer
+            writer = None if sort_by else _open_merged_writer(output_path, output_format, database_url)
+            ex_merged, qa_merged = exercise_table(), question_table()
+            seen = {}
+            duplicates = []
+            jobs = [(path, source, mode) for path in docx_paths]
+            for path, (ex_table, qa_table) in zip(docx_paths, executor.map(_extract_tables, jobs)):
+                name = os.path.basename(path)
+                for exid in ex_table.column('exid'):
+                    if exid in seen:
+                        duplicates.append((exid, name))
+                    seen[exid] = name
+                if writer is None:
+                    ex_merged.extend(ex_table)
+                    qa_merged.extend(qa_table)
+                elif not duplicates:
+                    # Stop feeding the writer once the batch is known to be rejected
+                    for row in ex_table:
+                        writer.ex_data.append(row)
+                    for row in qa_table:
+                        writer.qa_data.append(row)
+            if duplicates:
+                if writer is not None:
+                    writer.discard()
+                raise DuplicateExidError(duplicates)
+            if writer is None:
+                writer = _open_merged_writer(output_path, output_format, database_url)
+                ex_sorted, qa_sorted = sort_tables(ex_merged, qa_merged, *sort_by)
+                for row in ex_sorted:
+                    writer.ex_data.append(row)
+                for row in qa_sorted:
+                    writer.qa_data.append(row)
+            writer.save()
+        else:
+            work_dir = tempfile.mkdtemp()
+            try:
+                jobs = []
+                for path in docx_paths:
+                    stem = os.path.splitext(os.path.basename(path))[0]
+                    name = _unique_name(work_dir, f"{stem}{OUTPUT_FORMATS[output_format].suffix}")
+                    # Reserve the name so later documents with the same stem get a suffix
+                    open(os.path.join(work_dir, name), 'wb').close()
+                    jobs.append((path, os.path.join(work_dir, name), source, mode, output_format))
+                with ZipFile(output_path, 'w') as zipf:
+                    for converted_path in executor.map(_convert_one, jobs):
+                        zipf.write(converted_path, os.path.basename(converted_path))
+            finally:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        'documents': len(docx_paths),
+        'workers': workers,
+        'seconds': elapsed,
+        'documents_per_second': len(docx_paths) / elapsed if elapsed else 0.0,
+    }
+    logger.info(f"Converted {stats['documents']} documents with {workers} workers in "
+                f"{elapsed:.2f}s ({stats['documents_per_second']:.1f} documents/s)")
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert many Word documents to Excel or another format in parallel")
+    parser.add_argument('inputs', nargs='+', help=".docx files or .zip archives of .docx files")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('-o', '--output', help="merged output, or .zip of per-file outputs with --per-file")
+    target.add_argument('--database-url',
+                        help="load the merged rows into this database, e.g. sqlite:///exercises.db")
+    parser.add_argument('--per-file', action='store_true', help="write one output per document into a zip")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--source', choices=['docx', 'stream'], default='docx', help="paragraph source")
+    parser.add_argument('--mode', choices=sorted(CONVERSION_MODES), default='reader', help="conversion mode")
+    parser.add_argument('--format', choices=sorted(OUTPUT_FORMATS), default='xlsx', dest='output_format',
+                        help="output format; csv, jsonl and parquet are zips of one file per sheet")
+    parser.add_argument('--sort-by', default='',
+                        help="comma-separated ex_data columns to sort a merged workbook by, e.g. cat_seq,subcat_seq")
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        docx_paths = []
+        for path in args.inputs:
+            if path.lower().endswith('.zip'):
+                docx_paths.extend(extract_docx_files_from_zip(path, work_dir))
+            else:
+                docx_paths.append(path)
+
+        stats = convert_batch(docx_paths, args.output, merge=not args.per_file,
+                              max_workers=args.workers, source=args.source, mode=args.mode,
+                              output_format=args.output_format, database_url=args.database_url,
+                              sort_by=[name.strip() for name in args.sort_by.split(',') if name.strip()])
+        print(f"{stats['documents']} documents in {stats['seconds']:.2f}s "
+              f"({stats['documents_per_second']:.1f} documents/s) -> {args.output or args.database_url}")
+    except ValueError as e:
+        logger.error(str(e))
+        return 1
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,577 @@
+import os
+import sys
+import gc
+import io
+import logging
+import socket
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from docx import Document
+from converter import (OUTPUT_FORMATS, DescriptionExtractor, ExerciseExtractor, QuestionExtractor,
+                       available_output_formats, exercise_table, parse_question_line, question_table, write_rows)
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def create_synthetic_paragraphs(paragraph_count=100_000):
+    """Creates a list of paragraph texts shaped like a real exercise bank"""
+    block = [
+        "exid : EX{n}",
+        "title : Exercise {n}",
+        "description : Read the code below and answer the questions",
+        "category : Loops",
+        "subcategoryid : LOOP",
+        "level : 2",
+        "language : python",
+        "qlocation : ex{n}.txt",
+        "module : basics",
+        "ex_seq : {n}",
+        "cat_seq : 3",
+        "subcat_seq : 1",
+        "league : silver",
+        "labels : loops,range",
+        "Code:",
+        "for i in range(10):",
+        "    print(i)",
+        "Answer the following questions:",
+        "What does the loop print? Options: 0-9,1-10,0-10 answer: 1",
+        "How many lines are printed? Answer: 10",
+    ]
+    paragraphs = []
+    n = 0
+    while len(paragraphs) < paragraph_count:
+        paragraphs.extend(line.format(n=n) for line in block)
+        n += 1
+    return paragraphs[:paragraph_count]
+
+def legacy_extract_sheet1(paragraphs):
+    """The startswith chain extract_sheet1_data_from_docx used before the field recognizer"""
+    data = []
+    current = ["", "", "", "", "", 0, "", "", "", 0, 0, 0, "", ""]
+    for text in paragraphs:
+        text = text.strip()
+        if text.startswith("exid :"):
+            if current[0]:
+                data.append(current[:])
+            current[0] = text.split("exid :")[1].strip()
+        elif text.startswith("title :"):
+            current[1] = text.split("title :")[1].strip()
+        elif text.startswith("description :"):
+            current[2] = text.split("description :")[1].strip()
+        elif text.startswith("category :"):
+            current[3] = text.split("category :")[1].strip()
+        elif text.startswith("subcategoryid :"):
+            current[4] = text.split("subcategoryid :")[1].strip()
+        elif text.startswith("level :"):
+            try:
+                current[5] = int(text.split("level :")[1].strip())
+            except ValueError:
+                current[5] = 0
+        elif text.startswith("language :"):
+            current[6] = text.split("language :")[1].strip()
+        elif text.startswith("qlocation :"):
+            current[7] = text.split("qlocation :")[1].strip()
+        elif text.startswith("module :"):
+            current[8] = text.split("module :")[1].strip()
+        elif text.startswith("ex_seq :"):
+            try:
+                current[9] = int(text.split("ex_seq :")[1].strip())
+            except ValueError:
+                current[9] = 0
+        elif text.startswith("cat_seq :"):
+            try:
+                current[10] = int(text.split("cat_seq :")[1].strip())
+            except ValueError:
+                current[10] = 0
+        elif text.startswith("subcat_seq :"):
+            try:
+                current[11] = int(text.split("subcat_seq :")[1].strip())
+            except ValueError:
+                current[11] = 0
+        elif text.startswith("league :"):
+            current[12] = text.split("league :")[1].strip()
+        elif text.startswith("labels :"):
+            current[13] = text.split("labels :")[1].strip()
+    if current[0]:
+        data.append(current[:])
+    return data
+
+def recognizer_extract_sheet1(paragraphs):
+    """Extract ex_data rows with the compiled field directive recognizer"""
+    extractor = ExerciseExtractor()
+    for text in paragraphs:
+        extractor.feed(text)
+    return extractor.finish()
+
+def measure_lines_per_second(extract, paragraphs, repeat=5):
+    """Returns the best lines-per-second rate over several runs, and the extracted rows.
+
+    The garbage collector is paused while timing, as timeit does, so that
+    collections triggered by earlier results do not skew later runs.
+    """
+    best = None
+    rows = None
+    for _ in range(repeat):
+        rows = None
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            rows = extract(paragraphs)
+            elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    return len(paragraphs) / best, rows
+
+def bench_field_recognizer(paragraph_count=100_000):
+    """Compare the legacy startswith chain against the field directive recognizer"""
+    paragraphs = create_synthetic_paragraphs(paragraph_count)
+    before, legacy_rows = measure_lines_per_second(legacy_extract_sheet1, paragraphs)
+    after, rows = measure_lines_per_second(recognizer_extract_sheet1, paragraphs)
+
+    if [list(row) for row in rows] != legacy_rows:
+        logger.error("Field recognizer output differs from the legacy startswith chain")
+        return False
+
+    logger.info(f"Field recognizer on {paragraph_count} paragraphs ({len(rows)} exercises)")
+    logger.info(f"  before (startswith chain): {before:,.0f} lines/s")
+    logger.info(f"  after (field recognizer):  {after:,.0f} lines/s ({after / before:.2f}x)")
+    return True
+
+def legacy_parse_question_line(text):
+    """The ``in``/``split`` chain QuestionExtractor used before the question-line tokenizer"""
+    if "Options:" in text and "answer:" in text:
+        try:
+            question, options_answer = text.split("Options:")
+            options, answer = options_answer.split("answer:")
+            options = options.strip().split(',')
+            answer = answer.strip()
+            if ',' in answer:
+                answer_type = "checkbox"
+            else:
+                answer_type = "radio"
+                try:
+                    answer = int(answer)
+                except ValueError:
+                    pass
+            return (question.strip(), options, answer, answer_type)
+        except ValueError:
+            return None
+    elif "Answer:" in text:
+        try:
+            question, answer = text.split("Answer:")
+            answer = answer.strip()
+            try:
+                answer = float(answer)
+                answer_type = "number"
+                if answer.is_integer():
+                    answer = int(answer)
+            except ValueError:
+                answer_type = "text"
+            return (question.strip(), [], answer, answer_type)
+        except ValueError:
+            return None
+    return None
+
+def measure_parse_rate(parse, lines, repeat=3):
+    """Returns the best lines-per-second rate of a per-line parser, and its results"""
+    return measure_lines_per_second(lambda corpus: [parse(text) for text in corpus], lines, repeat)
+
+def bench_question_tokenizer(line_count=1_000_000):
+    """Compare the legacy split chain against the precompiled question-line tokenizer"""
+    lines = [text.strip() for text in create_synthetic_paragraphs(line_count)]
+    before, legacy = measure_parse_rate(legacy_parse_question_line, lines)
+    after, tokens = measure_parse_rate(parse_question_line, lines)
+
+    # Without Hint: or repeated delimiters both parsers must agree
+    if [None if token is None else token[:4] for token in tokens] != legacy:
+        logger.error("Question tokenizer output differs from the legacy split chain")
+        return False
+
+    questions = sum(token is not None for token in tokens)
+    logger.info(f"Question tokenizer on {line_count:,} lines ({questions:,} questions)")
+    logger.info(f"  before (split chain): {before:,.0f} lines/s")
+    logger.info(f"  after (tokenizer):    {after:,.0f} lines/s ({after / before:.2f}x)")
+    return True
+
+def create_long_description_paragraphs(description_lines, exercise_count=3):
+    """Creates debug-mode exercises whose descriptions span many paragraphs"""
+    paragraphs = []
+    for n in range(exercise_count):
+        paragraphs.append(f"exid : EX{n}")
+        paragraphs.append(f"title : Exercise {n}")
+        paragraphs.append("description : Implement the function described below")
+        paragraphs.extend(f"Step {i}: update the running total and check the invariant still holds"
+                          for i in range(description_lines))
+        paragraphs.append(f"assert solve({n}) == {n}")
+    return paragraphs
+
+def legacy_extract_descriptions(paragraphs):
+    """The ``description += "\\n" + text`` accumulation of the attached extract_debug_data"""
+    ex_data = []
+    current_entry = {}
+    collecting_description = False
+    for para in paragraphs:
+        text = para.strip()
+        if text.startswith("exid :"):
+            if current_entry:
+                ex_data.append(current_entry)
+            current_entry = {'exid': text.split("exid :")[1].strip()}
+            collecting_description = False
+        elif text.startswith("title :"):
+            current_entry['title'] = text.split("title :")[1].strip()
+            collecting_description = False
+        elif text.startswith("description :"):
+            current_entry['description'] = text.split("description :")[1].strip()
+            collecting_description = True
+        elif "assert" in text:
+            collecting_description = False
+        elif collecting_description:
+            current_entry['description'] += "\n" + text
+    if current_entry:
+        ex_data.append(current_entry)
+    return [entry['description'] for entry in ex_data]
+
+def joined_extract_descriptions(paragraphs):
+    """Extract descriptions with DescriptionExtractor, which joins paragraph lists once"""
+    extractor = DescriptionExtractor()
+    for text in paragraphs:
+        extractor.feed(text)
+    return [row.description for row in extractor.finish()]
+
+# Per-line cost may grow by at most this factor from the smallest to the largest size
+LINEAR_SCALING_TOLERANCE = 2.0
+
+def bench_description_accumulation(line_counts=(1_250, 2_500, 5_000, 10_000)):
+    """Show that multi-paragraph descriptions accumulate in linear time"""
+    ok = True
+    per_line = {}
+    for lines in line_counts:
+        paragraphs = create_long_description_paragraphs(lines)
+        before, legacy = measure_lines_per_second(legacy_extract_descriptions, paragraphs, repeat=3)
+        after, descriptions = measure_lines_per_second(joined_extract_descriptions, paragraphs, repeat=3)
+        if descriptions != legacy:
+            logger.error(f"Joined descriptions differ from the legacy accumulation at {lines} lines")
+            return False
+        per_line[lines] = 1e6 / after
+        logger.info(f"{lines:>6}-line descriptions: legacy {1e6 / before:.2f} us/line, "
+                    f"joined {1e6 / after:.2f} us/line")
+
+    growth = per_line[line_counts[-1]] / per_line[line_counts[0]]
+    logger.info(f"Joined per-line cost grows {growth:.2f}x over a "
+                f"{line_counts[-1] // line_counts[0]}x longer description")
+    if growth > LINEAR_SCALING_TOLERANCE:
+        logger.error("Description accumulation is not scaling linearly")
+        ok = False
+    return ok
+
+def measure_retained_bytes(build):
+    """Returns the bytes still allocated by build()'s result once it returns, and the result"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = build()
+        gc.collect()
+        retained, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return retained, result
+
+def bench_columnar_memory(paragraph_count=400_000):
+    """Compare the memory held by extracted rows as lists of records versus columnar tables"""
+    # Strip up front so the corpus itself is not attributed to either representation
+    paragraphs = [text.strip() for text in create_synthetic_paragraphs(paragraph_count)]
+
+    def extract(ex_rows, qa_rows):
+        extractors = [ExerciseExtractor(ex_rows), QuestionExtractor(qa_rows)]
+        for text in paragraphs:
+            for extractor in extractors:
+                extractor.feed(text)
+        return tuple(extractor.finish() for extractor in extractors)
+
+    before, rows = measure_retained_bytes(lambda: extract([], []))
+    after, tables = measure_retained_bytes(lambda: extract(exercise_table(), question_table()))
+    if [list(table) for table in tables] != [list(records) for records in rows]:
+        logger.error("Columnar tables differ from the extracted records")
+        return False
+
+    logger.info(f"Extracted rows in memory ({len(rows[0]):,} exercises, {len(rows[1]):,} questions)")
+    logger.info(f"  before (lists of records): {before / 1e6:,.1f} MB")
+    logger.info(f"  after (columnar tables):   {after / 1e6:,.1f} MB ({before / after:.2f}x smaller)")
+    return True
+
+def bench_output_formats(paragraph_count=200_000, repeat=3):
+    """Compare rows written per second by each output format from the same extracted rows"""
+    paragraphs = [text.strip() for text in create_synthetic_paragraphs(paragraph_count)]
+    extractors = [ExerciseExtractor(exercise_table()), QuestionExtractor(question_table())]
+    for text in paragraphs:
+        for extractor in extractors:
+            extractor.feed(text)
+    ex_rows, qa_rows = (extractor.finish() for extractor in extractors)
+    row_count = len(ex_rows) + len(qa_rows)
+
+    logger.info(f"Output formats ({row_count:,} rows)")
+    available = available_output_formats()
+    for output_format in OUTPUT_FORMATS:
+        if output_format not in available:
+            logger.info(f"  {output_format}: skipped, {OUTPUT_FORMATS[output_format].requires} is not installed")
+            continue
+        best = None
+        for _ in range(repeat):
+            output = io.BytesIO()
+            start = time.perf_counter()
+            write_rows(ex_rows, qa_rows, output, output_format)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        logger.info(f"  {output_format}: {row_count / best:,.0f} rows/s, {len(output.getvalue()) / 1e6:,.1f} MB")
+    return True
+
+def measure_database_load(ex_rows, qa_rows, database_url, batch_size):
+    """Returns the seconds taken to load rows into a database in batches of batch_size"""
+    from database import DatabaseWriter
+
+    start = time.perf_counter()
+    writer = DatabaseWriter(database_url, batch_size=batch_size)
+    for row in ex_rows:
+        writer.ex_data.append(row)
+    for row in qa_rows:
+        writer.qa_data.append(row)
+    writer.save()
+    return time.perf_counter() - start
+
+def bench_database_load(exercise_count=5_000):
+    """Compare loading an exercise bank into SQLite row by row and in multi-row batches"""
+    from database import DB_BATCH_SIZE
+
+    paragraphs = [text.strip() for text in create_synthetic_paragraphs(exercise_count * 20)]
+    extractors = [ExerciseExtractor(exercise_table()), QuestionExtractor(question_table())]
+    for text in paragraphs:
+        for extractor in extractors:
+            extractor.feed(text)
+    ex_rows, qa_rows = (extractor.finish() for extractor in extractors)
+
+    logger.info(f"Database load ({len(ex_rows):,} exercises, {len(qa_rows):,} questions, SQLite)")
+    with tempfile.TemporaryDirectory() as directory:
+        row_by_row = measure_database_load(ex_rows, qa_rows, f"sqlite:///{directory}/rows.db", 1)
+        database_url = f"sqlite:///{directory}/batched.db"
+        batched = measure_database_load(ex_rows, qa_rows, database_url, DB_BATCH_SIZE)
+        # Loading the same bank again upserts every exercise and replaces its questions
+        reload = measure_database_load(ex_rows, qa_rows, database_url, DB_BATCH_SIZE)
+    logger.info(f"  row by row:        {row_by_row:.2f}s")
+    logger.info(f"  batches of {DB_BATCH_SIZE:,}:   {batched:.2f}s ({row_by_row / batched:.1f}x faster)")
+    logger.info(f"  re-load (upsert):  {reload:.2f}s")
+    return True
+
+def bench_stage_timing(paragraph_count=50_000, repeat=7):
+    """Measure the overhead of per-stage timing on a streamed extraction and show the stage breakdown"""
+    from converter import extract_document_data
+    from metrics import timed_conversion
+
+    docx_bytes = create_synthetic_docx(paragraph_count)
+    untimed = timed = None
+    stages = {}
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            extract_document_data(io.BytesIO(docx_bytes), source='stream')
+            elapsed = time.perf_counter() - start
+            untimed = elapsed if untimed is None else min(untimed, elapsed)
+
+            with timed_conversion(len(docx_bytes)) as timings:
+                start = time.perf_counter()
+                extract_document_data(io.BytesIO(docx_bytes), source='stream')
+                elapsed = time.perf_counter() - start
+            if timed is None or elapsed < timed:
+                timed, stages = elapsed, timings.seconds
+        finally:
+            gc.enable()
+
+    logger.info(f"Stage timing ({paragraph_count:,} paragraphs, stream source)")
+    logger.info(f"  untimed: {untimed:.3f}s, timed: {timed:.3f}s ({(timed / untimed - 1) * 100:+.1f}%)")
+    for name, seconds in stages.items():
+        logger.info(f"  {name}: {seconds * 1000:.1f} ms")
+    return True
+
+def bench_parallel_extraction(exercise_count=10_000, repeat=3):
+    """Compare sequential and parallel extraction of one large document for 1..CPU-count workers"""
+    from bench_suite import create_exercise_document
+    from converter import extract_document_data
+
+    docx_file = io.BytesIO()
+    paragraph_count = create_exercise_document(docx_file, exercise_count, description_lines=3)
+    docx_bytes = docx_file.getvalue()
+    cpu_count = os.cpu_count() or 1
+    worker_counts = sorted({1, 2, 4, 8, cpu_count} & set(range(1, cpu_count + 1))) or [1]
+    if cpu_count == 1:
+        # Still exercise the pool so its overhead shows up on single-core machines
+        worker_counts.append(2)
+
+    logger.info(f"Parallel extraction ({paragraph_count:,} paragraphs, stream source, {cpu_count} CPUs)")
+    expected = None
+    baseline = None
+    for workers in worker_counts:
+        best = None
+        for _ in range(repeat):
+            gc.collect()
+            start = time.perf_counter()
+            data = extract_document_data(io.BytesIO(docx_bytes), include_code=True, source='stream',
+                                         workers=workers)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        if expected is None:
+            expected, baseline = data, best
+        elif [list(rows) for rows in data] != [list(rows) for rows in expected]:
+            logger.error(f"Extraction with {workers} workers differs from the sequential pass")
+            return False
+        label = "sequential" if workers == 1 else f"{workers} workers"
+        logger.info(f"  {label}: {best:.2f}s ({baseline / best:.2f}x)")
+    return True
+
+# Cold-import budget per module, and modules that must stay out of the import graph
+IMPORT_TIME_BUDGET_SECONDS = float(os.environ.get("IMPORT_TIME_BUDGET_SECONDS", "1.0"))
+FORBIDDEN_IMPORTS = ("pandas",)
+
+def measure_import_time(module, repeat=5):
+    """Returns the best cold import time of a module in fresh interpreters, and its heavy imports"""
+    code = (
+        "import sys, time; start = time.perf_counter(); "
+        f"import {module}; elapsed = time.perf_counter() - start; "
+        f"print(elapsed, ','.join(m for m in {FORBIDDEN_IMPORTS!r} if m in sys.modules))"
+    )
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    best = None
+    loaded = ""
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, "-c", code], cwd=repo_dir,
+                                capture_output=True, text=True, check=True)
+        elapsed, _, loaded = result.stdout.strip().splitlines()[-1].partition(" ")
+        best = float(elapsed) if best is None else min(best, float(elapsed))
+    return best, loaded
+
+def bench_import_time(modules=("converter", "app")):
+    """Check that importing the web app stays fast and does not pull in pandas"""
+    ok = True
+    for module in modules:
+        elapsed, loaded = measure_import_time(module)
+        logger.info(f"import {module}: {elapsed * 1000:.0f} ms")
+        if loaded:
+            logger.error(f"import {module} loads {loaded}, which must stay lazily imported")
+            ok = False
+        if elapsed > IMPORT_TIME_BUDGET_SECONDS:
+            logger.error(f"import {module} exceeds the {IMPORT_TIME_BUDGET_SECONDS:.1f}s budget")
+            ok = False
+    return ok
+
+# Servers compared by bench_serving; {port} is filled in per run. Caches are
+# disabled in the environment so every request performs a full conversion.
+SERVING_COMMANDS = {
+    "dev server": [sys.executable, "-c",
+                   "from app import app; app.run(host='127.0.0.1', port={port}, debug=True, use_reloader=False)"],
+    "gunicorn": ["gunicorn", "--config", "gunicorn.conf.py", "--bind", "127.0.0.1:{port}",
+                 "--access-logfile", "/dev/null", "main:app"],
+}
+
+def create_synthetic_docx(paragraph_count=2_000):
+    """Returns the bytes of a .docx holding the synthetic exercise bank"""
+    doc = Document()
+    for text in create_synthetic_paragraphs(paragraph_count):
+        doc.add_paragraph(text)
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _post_upload(url, docx_bytes):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="bench.docx"\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + docx_bytes + f"\r\n--{boundary}--\r\n".encode()
+    req = urllib.request.Request(url, data=body, headers={
+        "Content-Type": f"multipart/form-data; boundary={boundary}"})
+    with urllib.request.urlopen(req) as response:
+        response.read()
+        return response.status
+
+def measure_requests_per_second(command, docx_bytes, requests=100, concurrency=8):
+    """Starts a server, posts the document to /upload concurrently and returns requests/s"""
+    port = _free_port()
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, RESULT_CACHE_MAX_BYTES="0", BLOCK_CACHE_MAX_BYTES="0",
+               RESULT_CACHE_DIR=tempfile.mkdtemp())
+    server = subprocess.Popen([arg.format(port=port) for arg in command], cwd=repo_dir, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}/upload"
+    try:
+        deadline = time.time() + 30
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                if time.time() > deadline:
+                    raise RuntimeError(f"Server did not start: {' '.join(command)}")
+                time.sleep(0.2)
+
+        _post_upload(url, docx_bytes)  # warm up
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            statuses = list(executor.map(lambda _: _post_upload(url, docx_bytes), range(requests)))
+        elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    if any(status != 200 for status in statuses):
+        raise RuntimeError(f"{sum(status != 200 for status in statuses)} uploads failed")
+    return requests / elapsed
+
+def bench_serving(requests=100, concurrency=8):
+    """Compare /upload throughput of the Werkzeug dev server and the gunicorn profile"""
+    docx_bytes = create_synthetic_docx()
+    logger.info(f"/upload throughput, {requests} requests x {len(docx_bytes) / 1024:.0f} KB, "
+                f"concurrency {concurrency}, {os.cpu_count()} CPUs")
+    rates = {}
+    for name, command in SERVING_COMMANDS.items():
+        try:
+            rates[name] = measure_requests_per_second(command, docx_bytes, requests, concurrency)
+        except (OSError, RuntimeError) as e:
+            logger.error(f"{name}: {str(e)}")
+            return False
+        logger.info(f"  {name}: {rates[name]:.1f} requests/s")
+    return True
+
+def main():
+    results = [
+        bench_field_recognizer(),
+        bench_description_accumulation(),
+        bench_question_tokenizer(),
+        bench_columnar_memory(),
+        bench_output_formats(),
+        bench_database_load(),
+        bench_stage_timing(),
+        bench_parallel_extraction(),
+        bench_import_time(),
+    ]
+    # Starting servers is slow, so the serving comparison is opt-in
+    if "--serving" in sys.argv[1:]:
+        results.append(bench_serving())
+    if not all(results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
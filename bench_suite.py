@@ -0,0 +1,266 @@
+import os
+import sys
+import gc
+import io
+import json
+import time
+import logging
+import argparse
+import platform
+import subprocess
+import tempfile
+from xml.sax.saxutils import escape
+from zipfile import ZIP_DEFLATED, ZipFile
+from docx import Document
+from metrics import peak_rss_bytes
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Exercise counts benchmarked by default
+DEFAULT_SIZES = (10, 100, 1_000, 10_000, 50_000)
+
+# Each benchmark repeats until it has run this long (or MAX_REPEAT times) and keeps the best time
+MIN_BENCH_SECONDS = 1.0
+MAX_REPEAT = 5
+
+# Allowed slowdown and memory growth over the baseline before compare mode flags a regression
+TIME_TOLERANCE = float(os.environ.get("BENCH_TIME_TOLERANCE", "0.15"))
+MEMORY_TOLERANCE = float(os.environ.get("BENCH_MEMORY_TOLERANCE", "0.10"))
+
+_QUESTION_SHAPES = (
+    ("Which loop prints 0 to 9?", "Options: for,while,range,print answer: 1"),
+    ("Select every built-in type:", "Options: list,array,dict,tuple answer: 1,3,4"),
+    ("How many lines are printed?", "Answer: 10"),
+)
+
+def iter_exercise_paragraphs(exercises, questions_per_exercise=3, code_lines=5, description_lines=1):
+    """Yield the paragraph texts of a synthetic exercise bank.
+
+    Every exercise has the full set of ex_data fields, a description of
+    ``description_lines`` paragraphs, a ``code_lines``-line code block and
+    ``questions_per_exercise`` questions cycling through radio, checkbox and
+    direct-answer shapes.
+    """
+    for n in range(exercises):
+        yield f"exid : EX{n:06d}"
+        yield f"title : Exercise {n}"
+        yield f"description : Exercise {n} asks you to read a short program and predict its output."
+        for line in range(1, description_lines):
+            yield f"Paragraph {line} of the problem statement explains the inputs and expected output in detail."
+        yield f"category : Category {n % 12}"
+        yield f"subcategoryid : SUB{n % 40}"
+        yield f"level : {n % 5 + 1}"
+        yield "language : python"
+        yield f"qlocation : ex{n:06d}.txt"
+        yield f"module : module_{n % 8}"
+        yield f"ex_seq : {n}"
+        yield f"cat_seq : {n % 12}"
+        yield f"subcat_seq : {n % 40}"
+        yield "league : silver"
+        yield "labels : loops,range"
+        yield "Code:"
+        code = ["def main():"] + [f"    value_{line} = {line} * {n}" for line in range(1, code_lines - 1)]
+        yield from (code + ["    return 0"])[:code_lines]
+        yield "Answer the following questions:"
+        for q in range(questions_per_exercise):
+            question, answer = _QUESTION_SHAPES[q % len(_QUESTION_SHAPES)]
+            yield question
+            yield answer
+
+def create_exercise_document(path, exercises, questions_per_exercise=3, code_lines=5, description_lines=1):
+    """Write a synthetic exercise bank to a .docx at ``path``; returns its paragraph count.
+
+    Paragraphs are streamed straight into word/document.xml of an empty
+    python-docx document, so even 50k-exercise banks are written in seconds.
+    """
+    template = io.BytesIO()
+    Document().save(template)
+    paragraph_count = 0
+
+    with ZipFile(template) as source, ZipFile(path, 'w', ZIP_DEFLATED) as target:
+        for item in source.infolist():
+            if item.filename != 'word/document.xml':
+                target.writestr(item, source.read(item))
+                continue
+
+            # Keep the template's namespaces and section properties around the generated body
+            xml = source.read(item).decode('utf-8')
+            head, _, rest = xml.partition('<w:body>')
+            body, _, tail = rest.partition('</w:body>')
+            with target.open('word/document.xml', 'w') as document:
+                document.write(f"{head}<w:body>".encode('utf-8'))
+                for text in iter_exercise_paragraphs(exercises, questions_per_exercise, code_lines,
+                                                     description_lines):
+                    document.write(
+                        f'<w:p><w:r><w:t xml:space="preserve">{escape(text)}</w:t></w:r></w:p>'.encode('utf-8')
+                    )
+                    paragraph_count += 1
+                document.write(f"{body}</w:body>{tail}".encode('utf-8'))
+    return paragraph_count
+
+def _convert_to_excel(docx_path, source):
+    from converter import convert_word_to_excel
+    with tempfile.TemporaryDirectory() as directory:
+        convert_word_to_excel(docx_path, os.path.join(directory, 'bench.xlsx'), source=source)
+
+def _create_text_files(docx_path, source):
+    from converter import create_text_files
+    with tempfile.TemporaryDirectory() as directory:
+        create_text_files(docx_path, source=source, zip_path=os.path.join(directory, 'bench.zip'))
+
+def _extract_sheet1(docx_path, source):
+    from converter import extract_sheet1_data_from_docx
+    extract_sheet1_data_from_docx(docx_path, source=source)
+
+def _extract_sheet2(docx_path, source):
+    from converter import extract_sheet2_data_from_docx
+    extract_sheet2_data_from_docx(docx_path, source=source)
+
+# Benchmark name -> function of (docx_path, source)
+BENCHMARKS = {
+    'extract_sheet1_data_from_docx': _extract_sheet1,
+    'extract_sheet2_data_from_docx': _extract_sheet2,
+    'convert_word_to_excel': _convert_to_excel,
+    'create_text_files': _create_text_files,
+}
+
+def run_benchmark_child(name, docx_path, source):
+    """Time one benchmark in this process and print its best time and peak RSS as JSON"""
+    # Silence the converter's per-call logging so it is not part of the measurement
+    logging.disable(logging.CRITICAL)
+    benchmark = BENCHMARKS[name]
+    best = None
+    total = 0.0
+    for _ in range(MAX_REPEAT):
+        gc.collect()
+        start = time.perf_counter()
+        benchmark(docx_path, source)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        total += elapsed
+        if total >= MIN_BENCH_SECONDS:
+            break
+    print(json.dumps({'seconds': best, 'peak_rss_bytes': peak_rss_bytes()}))
+
+def measure(name, docx_path, source):
+    """Run one benchmark in a fresh interpreter so its peak RSS is its own"""
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', name, docx_path, '--source', source],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def run_suite(sizes=DEFAULT_SIZES, benchmarks=tuple(BENCHMARKS), source='docx', questions_per_exercise=3,
+              code_lines=5, description_lines=3):
+    """Benchmark each function on generated documents of each size; returns the results document"""
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for exercises in sizes:
+            docx_path = os.path.join(directory, f"bank_{exercises}.docx")
+            paragraphs = create_exercise_document(docx_path, exercises, questions_per_exercise, code_lines,
+                                                  description_lines)
+            logger.info(f"{exercises:,} exercises ({paragraphs:,} paragraphs, "
+                        f"{os.path.getsize(docx_path) / 1e6:,.2f} MB)")
+            for name in benchmarks:
+                measured = measure(name, docx_path, source)
+                result = {
+                    'benchmark': name,
+                    'exercises': exercises,
+                    'paragraphs': paragraphs,
+                    'seconds': measured['seconds'],
+                    'peak_rss_bytes': measured['peak_rss_bytes'],
+                    'exercises_per_second': exercises / measured['seconds'],
+                    'paragraphs_per_second': paragraphs / measured['seconds'],
+                }
+                results.append(result)
+                logger.info(f"  {name}: {result['seconds']:.3f}s, {result['exercises_per_second']:,.0f} exercises/s, "
+                            f"peak RSS {result['peak_rss_bytes'] / 1e6:,.0f} MB")
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'created_at': time.time(),
+        'parameters': {
+            'source': source,
+            'questions_per_exercise': questions_per_exercise,
+            'code_lines': code_lines,
+            'description_lines': description_lines,
+        },
+        'results': results,
+    }
+
+def compare_results(baseline, current, time_tolerance=TIME_TOLERANCE, memory_tolerance=MEMORY_TOLERANCE):
+    """Return a description of each benchmark that got slower or used more memory than its baseline"""
+    if baseline.get('parameters') != current.get('parameters'):
+        logger.warning(f"Benchmark parameters differ from the baseline: "
+                       f"{baseline.get('parameters')} vs {current.get('parameters')}")
+
+    previous = {(result['benchmark'], result['exercises']): result for result in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        key = (result['benchmark'], result['exercises'])
+        before = previous.get(key)
+        if before is None:
+            continue
+        label = f"{result['benchmark']} at {result['exercises']:,} exercises"
+        time_change = result['seconds'] / before['seconds'] - 1
+        memory_change = result['peak_rss_bytes'] / before['peak_rss_bytes'] - 1
+        logger.info(f"{label}: time {time_change:+.1%}, peak RSS {memory_change:+.1%}")
+        if time_change > time_tolerance:
+            regressions.append(f"{label}: {before['seconds']:.3f}s -> {result['seconds']:.3f}s ({time_change:+.1%})")
+        if memory_change > memory_tolerance:
+            regressions.append(f"{label}: peak RSS {before['peak_rss_bytes'] / 1e6:,.0f} MB -> "
+                               f"{result['peak_rss_bytes'] / 1e6:,.0f} MB ({memory_change:+.1%})")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the converter on generated exercise banks")
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help="comma-separated exercise counts")
+    parser.add_argument('--benchmarks', default=','.join(BENCHMARKS), help="comma-separated benchmarks to run")
+    parser.add_argument('--source', choices=['docx', 'stream'], default='docx', help="paragraph source")
+    parser.add_argument('--questions', type=int, default=3, help="questions per exercise")
+    parser.add_argument('--code-lines', type=int, default=5, help="lines per code block")
+    parser.add_argument('--description-lines', type=int, default=3, help="paragraphs per description")
+    parser.add_argument('-o', '--output', default='bench_results.json', help="where to write the results")
+    parser.add_argument('--compare', metavar='BASELINE', help="flag regressions against a stored results file")
+    parser.add_argument('--results', help="compare this results file instead of running the suite")
+    parser.add_argument('--child', nargs=2, metavar=('BENCHMARK', 'DOCX'), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_benchmark_child(args.child[0], args.child[1], args.source)
+        return 0
+
+    if args.results:
+        with open(args.results) as f:
+            current = json.load(f)
+    else:
+        benchmarks = [name.strip() for name in args.benchmarks.split(',') if name.strip()]
+        unknown = [name for name in benchmarks if name not in BENCHMARKS]
+        if unknown:
+            logger.error(f"Unknown benchmark: {', '.join(unknown)}. Choose from: {', '.join(BENCHMARKS)}")
+            return 1
+        sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+        current = run_suite(sizes, benchmarks, args.source, args.questions, args.code_lines,
+                            args.description_lines)
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+        logger.info(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_results(baseline, current)
+        for regression in regressions:
+            logger.error(f"Regression: {regression}")
+        if regressions:
+            return 1
+        logger.info("No regressions against the baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+import io
+import os
+import logging
+import hashlib
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Bump when converter output changes so stale results are never served
+CACHE_VERSION = 3
+
+def file_digest(source, chunk_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a file path or seekable binary file object"""
+    digest = hashlib.sha256()
+    if hasattr(source, 'read'):
+        source.seek(0)
+        for chunk in iter(lambda: source.read(chunk_size), b''):
+            digest.update(chunk)
+        source.seek(0)
+    else:
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+def result_cache_key(source, mode, output_kind):
+    """Key a conversion result by the uploaded bytes, conversion mode and output kind"""
+    return f"v{CACHE_VERSION}-{file_digest(source)}-{mode}-{output_kind}"
+
+
+class ResultCache:
+    """Size-bounded on-disk cache of conversion results with LRU eviction and a TTL.
+
+    Entries are plain files named by key, so several worker processes can share
+    one directory. A file's mtime records when it was stored (for the TTL) and
+    its atime when it was last served (for LRU eviction).
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024, ttl=24 * 3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def get(self, key):
+        """Return the cached result for key as an open binary file, or None on a miss.
+
+        The entry is opened before anything else, so it is served in full even if
+        another worker evicts it meanwhile. The caller closes the file.
+        """
+        path = os.path.join(self.directory, key)
+        try:
+            cached = open(path, 'rb') if self.enabled else None
+        except FileNotFoundError:
+            cached = None
+
+        now = time.time()
+        if cached is not None:
+            stat = os.fstat(cached.fileno())
+            if now - stat.st_mtime > self.ttl:
+                cached.close()
+                cached = None
+                self._remove(path)
+
+        with self.lock:
+            if cached is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        # Mark as recently used without touching the stored time
+        try:
+            os.utime(path, (now, stat.st_mtime))
+        except FileNotFoundError:
+            pass
+        return cached
+
+    def put(self, key, source_path):
+        """Store a copy of source_path under key and evict entries over the size budget"""
+        with open(source_path, 'rb') as src:
+            self.put_stream(key, src)
+
+    def put_bytes(self, key, data):
+        """Store an in-memory result under key"""
+        self.put_stream(key, io.BytesIO(data))
+
+    def put_stream(self, key, src):
+        """Store the contents of a binary file object under key"""
+        if not self.enabled:
+            return
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.incoming-')
+        try:
+            with os.fdopen(fd, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(temp_path, os.path.join(self.directory, key))
+        except Exception:
+            self._remove(temp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until under max_bytes"""
+        now = time.time()
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith('.') or not entry.is_file():
+                continue
+            stat = entry.stat()
+            if now - stat.st_mtime > self.ttl:
+                self._remove(entry.path)
+            else:
+                entries.append((stat.st_atime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+            logger.debug(f"Evicted cached result {os.path.basename(path)}")
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+    def _remove(self, path):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def deep_sizeof(value):
+    """Approximate bytes held by nested lists/tuples of strings and numbers"""
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        size += sum(deep_sizeof(item) for item in value)
+    return size
+
+
+class BlockCache:
+    """In-process LRU map from exid-block fingerprints to their parsed output.
+
+    Bounded by the approximate memory its entries hold; ``max_bytes=0`` disables it.
+    """
+
+    def __init__(self, max_bytes=0):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def get(self, fingerprint):
+        with self.lock:
+            item = self.entries.get(fingerprint)
+            if item is None:
+                return None
+            self.entries.move_to_end(fingerprint)
+            return item[0]
+
+    def put(self, fingerprint, entry):
+        if not self.enabled:
+            return
+        size = deep_sizeof(fingerprint) + deep_sizeof(entry)
+        with self.lock:
+            previous = self.entries.pop(fingerprint, None)
+            if previous is not None:
+                self.total_bytes -= previous[1]
+            self.entries[fingerprint] = (entry, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_size
@@ -0,0 +1,174 @@
+from array import array
+
+# Integer columns are stored as signed 64-bit machine integers; a column that
+# receives a value outside that range falls back to a plain list
+INT_TYPECODE = 'q'
+# Dictionary codes index a column's distinct values, so 32 bits are plenty
+CODE_TYPECODE = 'i'
+
+class DictionaryColumn:
+    """String column stored as integer codes into a list of its distinct values"""
+
+    def __init__(self):
+        self.values = []
+        self.codes = array(CODE_TYPECODE)
+        self.lookup = {}
+
+    def encode(self, value):
+        code = self.lookup.get(value)
+        if code is None:
+            code = self.lookup[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def append(self, value):
+        self.codes.append(self.encode(value))
+
+    def pop(self):
+        return self.values[self.codes.pop()]
+
+    def extend(self, other):
+        """Append another dictionary column, re-encoding its codes into this dictionary"""
+        remap = array(CODE_TYPECODE, (self.encode(value) for value in other.values))
+        self.codes.extend(remap[code] for code in other.codes)
+
+    def take(self, indices):
+        column = DictionaryColumn()
+        column.values = list(self.values)
+        column.lookup = dict(self.lookup)
+        column.codes = array(CODE_TYPECODE, (self.codes[i] for i in indices))
+        return column
+
+    def __getitem__(self, index):
+        return self.values[self.codes[index]]
+
+    def __getstate__(self):
+        return self.values, self.codes
+
+    def __setstate__(self, state):
+        self.values, self.codes = state
+        self.lookup = {value: code for code, value in enumerate(self.values)}
+
+    def __iter__(self):
+        values = self.values
+        return (values[code] for code in self.codes)
+
+    def __len__(self):
+        return len(self.codes)
+
+
+class ColumnarTable:
+    """Append-only table that stores each column as a typed array.
+
+    Integer columns are ``array`` objects (or lists once a value overflows
+    64 bits), repeated string columns are dictionary encoded and the rest are
+    plain lists. Tables have the same
+    ``append`` interface as a list of rows, so extractors can fill them
+    directly, and iterate as ``record`` namedtuples for writers.
+    """
+
+    def __init__(self, record, int_columns=(), dictionary_columns=()):
+        self.record = record
+        self.int_columns = frozenset(int_columns)
+        self.dictionary_columns = frozenset(dictionary_columns)
+        self.columns = {name: self._new_column(name) for name in record._fields}
+        self._appenders = [self.columns[name].append for name in record._fields]
+
+    def _new_column(self, name):
+        if name in self.int_columns:
+            return array(INT_TYPECODE)
+        if name in self.dictionary_columns:
+            return DictionaryColumn()
+        return []
+
+    def _empty_like(self):
+        return ColumnarTable(self.record, self.int_columns, self.dictionary_columns)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_appenders']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._appenders = [self.columns[name].append for name in self.record._fields]
+
+    def append(self, row):
+        try:
+            for append, value in zip(self._appenders, row):
+                append(value)
+        except OverflowError:
+            self._widen(row)
+            self.append(row)
+
+    def _widen(self, row):
+        """Undo a partly appended row and turn integer arrays it overflows into lists"""
+        length = min(len(column) for column in self.columns.values())
+        for name, value in zip(self.record._fields, row):
+            column = self.columns[name]
+            if len(column) > length:
+                column.pop()
+            if isinstance(column, array) and not -2 ** 63 <= value < 2 ** 63:
+                self.columns[name] = list(column)
+        self._appenders = [self.columns[name].append for name in self.record._fields]
+
+    def extend(self, rows):
+        """Append rows, or every row of another table with the same layout"""
+        if isinstance(rows, ColumnarTable) and rows.record._fields == self.record._fields:
+            for name, column in self.columns.items():
+                other = rows.columns[name]
+                if isinstance(column, array) and not isinstance(other, array):
+                    column = self.columns[name] = list(column)
+                column.extend(other)
+            self._appenders = [self.columns[name].append for name in self.record._fields]
+        else:
+            for row in rows:
+                self.append(row)
+
+    def column(self, name):
+        return self.columns[name]
+
+    def __len__(self):
+        return len(self.columns[self.record._fields[0]])
+
+    def __getitem__(self, index):
+        return self.record._make(column[index] for column in self.columns.values())
+
+    def __iter__(self):
+        return map(self.record._make, zip(*self.columns.values()))
+
+    def argsort(self, *names):
+        """Row indices ordered by the given columns (stable)"""
+        keys = [self.columns[name] for name in names]
+        if len(keys) == 1:
+            return sorted(range(len(self)), key=keys[0].__getitem__)
+        return sorted(range(len(self)), key=lambda i: tuple(key[i] for key in keys))
+
+    def take(self, indices):
+        """A new table holding the rows at ``indices``, in that order"""
+        table = self._empty_like()
+        for name, column in self.columns.items():
+            if isinstance(column, DictionaryColumn):
+                table.columns[name] = column.take(indices)
+            elif isinstance(column, array):
+                table.columns[name] = array(column.typecode, (column[i] for i in indices))
+            else:
+                table.columns[name] = [column[i] for i in indices]
+        table._appenders = [table.columns[name].append for name in table.record._fields]
+        return table
+
+    def sorted_by(self, *names):
+        return self.take(self.argsort(*names))
+
+    def group_indices(self, name):
+        """Map each value of a column to the indices of its rows, in first-seen order"""
+        column = self.columns[name]
+        groups = {}
+        if isinstance(column, DictionaryColumn):
+            by_code = {}
+            for i, code in enumerate(column.codes):
+                by_code.setdefault(code, []).append(i)
+            return {column.values[code]: indices for code, indices in by_code.items()}
+        for i, value in enumerate(column):
+            groups.setdefault(value, []).append(i)
+        return groups
@@ -1,247 +1,1234 @@
+import io
 import os
+import csv
+import json
 import logging
 from docx import Document
+from lxml import etree
 from openpyxl import Workbook
-import pandas as pd
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
 import tempfile
-import shutil
-from zipfile import ZipFile
+import hashlib
+import time
+import importlib.util
+import multiprocessing
+from array import array
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import chain
+from zipfile import ZIP_DEFLATED, ZipFile
+from columnar import ColumnarTable
+from metrics import current_timings, stage
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-def extract_sheet1_data_from_docx(docx_path):
-    """Extract data from the Word document for Sheet1"""
-    document = Document(docx_path)
-    data = []
-
-    current_exid = ""
-    current_title = ""
-    current_description = ""
-    current_category = ""
-    current_subcategoryid = ""
-    current_level = 0
-    current_language = ""
-    current_qlocation = ""
-    current_module = ""
-    current_ex_seq = 0
-    current_cat_seq = 0
-    current_subcat_seq = 0
-    current_league = ""
-    current_labels = ""
-
-    for para in document.paragraphs:
-        text = para.text.strip()
+# Sheet layouts shared by every extractor and writer
+EX_DATA_COLUMNS = ['exid', 'title', 'description', 'category', 'subcategoryid', 
+                   'level', 'language', 'qlocation', 'module', 'ex_seq', 
+                   'cat_seq', 'subcat_seq', 'league', 'labels']
+QA_DATA_COLUMNS = ['exid', 'key', 'question', 'type', 'options', 'answer', 'hint']
 
-        if text.startswith("exid :"):
-            if current_exid:
-                data.append([
-                    current_exid, current_title, current_description, current_category,
-                    current_subcategoryid, current_level, current_language, current_qlocation,
-                    current_module, current_ex_seq, current_cat_seq, current_subcat_seq,
-                    current_league, current_labels
-                ])
-            current_exid = text.split("exid :")[1].strip()
-        elif text.startswith("title :"):
-            current_title = text.split("title :")[1].strip()
-        elif text.startswith("description :"):
-            current_description = text.split("description :")[1].strip()
-        elif text.startswith("category :"):
-            current_category = text.split("category :")[1].strip()
-        elif text.startswith("subcategoryid :"):
-            current_subcategoryid = text.split("subcategoryid :")[1].strip()
-        elif text.startswith("level :"):
-            try:
-                current_level = int(text.split("level :")[1].strip())
-            except ValueError:
-                current_level = 0
-        elif text.startswith("language :"):
-            current_language = text.split("language :")[1].strip()
-        elif text.startswith("qlocation :"):
-            current_qlocation = text.split("qlocation :")[1].strip()
-        elif text.startswith("module :"):
-            current_module = text.split("module :")[1].strip()
-        elif text.startswith("ex_seq :"):
-            try:
-                current_ex_seq = int(text.split("ex_seq :")[1].strip())
-            except ValueError:
-                current_ex_seq = 0
-        elif text.startswith("cat_seq :"):
-            try:
-                current_cat_seq = int(text.split("cat_seq :")[1].strip())
-            except ValueError:
-                current_cat_seq = 0
-        elif text.startswith("subcat_seq :"):
+# Typed records for one ex_data / qa_data row
+Exercise = namedtuple('Exercise', EX_DATA_COLUMNS)
+Question = namedtuple('Question', QA_DATA_COLUMNS)
+
+# Column storage for ex_data/qa_data tables: integer arrays and dictionary-encoded strings
+EX_DATA_INT_COLUMNS = ('level', 'ex_seq', 'cat_seq', 'subcat_seq')
+EX_DATA_DICTIONARY_COLUMNS = ('category', 'subcategoryid', 'language', 'module', 'league', 'labels')
+QA_DATA_INT_COLUMNS = ('key',)
+QA_DATA_DICTIONARY_COLUMNS = ('exid', 'type')
+
+def exercise_table():
+    """An empty columnar ex_data table"""
+    return ColumnarTable(Exercise, EX_DATA_INT_COLUMNS, EX_DATA_DICTIONARY_COLUMNS)
+
+def question_table():
+    """An empty columnar qa_data table"""
+    return ColumnarTable(Question, QA_DATA_INT_COLUMNS, QA_DATA_DICTIONARY_COLUMNS)
+
+def _to_int(value):
+    try:
+        return int(value)
+    except ValueError:
+        return 0
+
+# Field directive name -> type coercion for its value
+FIELD_COERCIONS = {field: str for field in EX_DATA_COLUMNS}
+FIELD_COERCIONS.update(level=_to_int, ex_seq=_to_int, cat_seq=_to_int, subcat_seq=_to_int)
+FIELD_INDEX = {field: index for index, field in enumerate(EX_DATA_COLUMNS)}
+
+def parse_field_directive(text):
+    """Classify a stripped paragraph as a ``field : value`` directive.
+
+    Returns ``(field, value)`` with the value coerced to the field's type,
+    or None when the line is not a known field directive.
+    """
+    field, separator, value = text.partition(" :")
+    if not separator:
+        return None
+    coerce = FIELD_COERCIONS.get(field)
+    if coerce is None:
+        return None
+    return field, coerce(value.strip())
+
+
+def parse_question_line(text):
+    """Tokenize a stripped ``... Options: a,b answer: 1 Hint: ...`` or ``... Answer: 8`` line.
+
+    Returns ``(question, options, answer, answer_type, hint)`` with the options
+    split on commas and the answer coerced for its type (radio/checkbox for
+    Options lines, number/text for Answer lines), or None when the line is
+    not a question.
+    The line is split at its last ``Options:`` (or last ``Answer:``), so the
+    question text may itself contain the delimiters. Raises ValueError when the
+    answer after ``Options:`` repeats the answer delimiter.
+    """
+    # Most paragraphs are not questions; one substring test covers "answer:" and "Answer:"
+    if "nswer:" not in text:
+        return None
+
+    question, options_sep, rest = text.rpartition("Options:") if "Options:" in text else ("", "", "")
+    if options_sep and "answer:" in rest:
+        options, _, answer = rest.partition("answer:")
+        hint = ""
+        if "Hint:" in answer:
+            answer, _, hint = answer.partition("Hint:")
+            hint = hint.strip()
+        if "nswer:" in answer:
+            raise ValueError("Repeated answer: delimiter after Options:")
+        answer = answer.strip()
+        if ',' in answer:
+            answer_type = "checkbox"
+        else:
+            answer_type = "radio"
             try:
-                current_subcat_seq = int(text.split("subcat_seq :")[1].strip())
+                answer = int(answer)
             except ValueError:
-                current_subcat_seq = 0
-        elif text.startswith("league :"):
-            current_league = text.split("league :")[1].strip()
-        elif text.startswith("labels :"):
-            current_labels = text.split("labels :")[1].strip()
-
-    if current_exid:
-        data.append([
-            current_exid, current_title, current_description, current_category,
-            current_subcategoryid, current_level, current_language, current_qlocation,
-            current_module, current_ex_seq, current_cat_seq, current_subcat_seq,
-            current_league, current_labels
-        ])
+                pass
+        options = options.strip().split(',')
+    else:
+        question, answer_sep, answer = text.rpartition("Answer:")
+        if not answer_sep:
+            return None
+        hint = ""
+        if "Hint:" in answer:
+            answer, _, hint = answer.partition("Hint:")
+            hint = hint.strip()
+        answer = answer.strip()
+        try:
+            answer = float(answer)
+            answer_type = "number"
+            if answer.is_integer():
+                answer = int(answer)
+        except ValueError:
+            answer_type = "text"
+        options = []
 
-    return data
+    return question.strip(), options, answer, answer_type, hint
 
-def extract_sheet2_data_from_docx(docx_path):
-    """Extract questions and answers from the Word document for Sheet2"""
-    document = Document(docx_path)
-    questions_data = []
-    exid = ""
-    question_key = 1
 
-    for para in document.paragraphs:
-        text = para.text.strip()
+class ExerciseExtractor:
+    """Collects ex_data ``Exercise`` records from a stream of paragraph texts.
+
+    Records are appended to ``rows`` as each exercise closes; pass any object with
+    an ``append`` method (such as a worksheet sink) to stream them elsewhere.
+    """
+
+    # Stage its feed time is recorded under when a conversion is timed
+    stage = 'ex_data_extraction'
+
+    def __init__(self, rows=None):
+        self.rows = [] if rows is None else rows
+        self.current = [0 if FIELD_COERCIONS[field] is _to_int else "" for field in EX_DATA_COLUMNS]
+
+    def feed(self, raw_text):
+        directive = parse_field_directive(raw_text.strip())
+        if directive is None:
+            return
+
+        field, value = directive
+        if field == 'exid' and self.current[0]:
+            # Field values carry over to the next exercise unless redefined
+            self.rows.append(Exercise._make(self.current))
+        self.current[FIELD_INDEX[field]] = value
+
+    def finish(self):
+        if self.current[0]:
+            self.rows.append(Exercise._make(self.current))
+        return self.rows
+
+    def state(self):
+        return tuple(self.current)
+
+    def restore(self, state):
+        self.current = list(state)
+
+
+class QuestionExtractor:
+    """Collects qa_data ``Question`` records from a stream of paragraph texts"""
+
+    # Stage its feed time is recorded under when a conversion is timed
+    stage = 'qa_data_extraction'
+
+    def __init__(self, rows=None):
+        self.rows = [] if rows is None else rows
+        self.exid = ""
+        self.question_key = 1
+
+    def feed(self, raw_text):
+        text = raw_text.strip()
 
         if text.startswith("exid :"):
-            exid = text.split("exid :")[1].strip()
-            question_key = 1
+            self.exid = text[len("exid :"):].strip()
+            self.question_key = 1
         elif text.startswith("Answer the following questions:"):
-            continue
-        elif "Options:" in text and "answer:" in text:
+            return
+        else:
             try:
-                question, options_answer = text.split("Options:")
-                options, answer = options_answer.split("answer:")
-                options = options.strip().split(',')
-                answer = answer.strip()
-
-                if ',' in answer:
-                    answer_type = "checkbox"
-                else:
-                    answer_type = "radio"
-                    try:
-                        answer = int(answer)
-                    except ValueError:
-                        pass
-
-                questions_data.append([
-                    exid, question_key, question.strip(), 
-                    answer_type, ','.join(options), answer
-                ])
-                question_key += 1
+                tokens = parse_question_line(text)
             except ValueError:
                 logger.error(f"Warning: Couldn't parse question options and answer in: {text}")
-                continue
-        elif "Answer:" in text:
-            try:
-                question, answer = text.split("Answer:")
-                answer = answer.strip()
-                try:
-                    answer = float(answer)
-                    answer_type = "number"
-                    if answer.is_integer():
-                        answer = int(answer)
-                except ValueError:
-                    answer_type = "text"
-
-                questions_data.append([
-                    exid, question_key, question.strip(),
-                    answer_type, "", answer
-                ])
-                question_key += 1
-            except ValueError:
-                logger.error(f"Warning: Couldn't parse question and answer in: {text}")
-                continue
+                return
+            if tokens is not None:
+                question, options, answer, answer_type, hint = tokens
+                self.rows.append(Question(
+                    self.exid, self.question_key, question,
+                    answer_type, ','.join(options), answer, hint
+                ))
+                self.question_key += 1
 
-    return questions_data
+    def finish(self):
+        return self.rows
 
-def convert_word_to_excel(input_path, output_path):
-    """Convert Word document to Excel format with exercise and QA data"""
+    def state(self):
+        return (self.exid, self.question_key)
+
+    def restore(self, state):
+        self.exid, self.question_key = state
+
+
+class CodeBlockExtractor:
+    """Collects code blocks, keyed by qlocation, from a stream of paragraph texts"""
+
+    # Stage its feed time is recorded under when a conversion is timed
+    stage = 'code_extraction'
+
+    def __init__(self, rows=None):
+        self.rows = [] if rows is None else rows
+        self.collecting_code = False
+        self.current_code = []
+        self.qlocation = None
+
+    def feed(self, raw_text):
+        text = raw_text.rstrip()  # Only remove trailing whitespace
+
+        directive = parse_field_directive(text.lstrip())
+        if directive is not None and directive[0] == 'qlocation':
+            qlocation = directive[1]
+            if not qlocation.endswith('.txt'):
+                qlocation = f"{qlocation}.txt"
+            self.qlocation = qlocation
+
+        elif text.lstrip().startswith("Code:"):
+            self.collecting_code = True
+            self.current_code = []
+
+        elif self.collecting_code and "Answer the following questions:" in text:
+            if self.current_code and self.qlocation:
+                # Join lines preserving original indentation
+                self.rows.append({
+                    "qlocation": self.qlocation,
+                    "code": "\n".join(self.current_code)
+                })
+            self.collecting_code = False
+            self.current_code = []
+
+        elif self.collecting_code:
+            # Preserve empty lines and original indentation
+            self.current_code.append(text)
+
+    def finish(self):
+        # Add the last code block if exists
+        if self.collecting_code and self.current_code and self.qlocation:
+            self.rows.append({
+                "qlocation": self.qlocation,
+                "code": "\n".join(self.current_code)
+            })
+        return self.rows
+
+    def state(self):
+        return (self.collecting_code, tuple(self.current_code), self.qlocation)
+
+    def restore(self, state):
+        self.collecting_code, current_code, self.qlocation = state
+        self.current_code = list(current_code)
+
+
+class DescriptionExtractor:
+    """Collects exid/title/description ``Exercise`` records for the debug and solver modes.
+
+    A description runs from its ``description :`` line over the following
+    paragraphs until the next field directive or assert line. Its paragraphs
+    are gathered in a list and joined once when the exercise closes, so long
+    problem statements take linear time. The remaining ex_data columns are
+    left at their defaults.
+    """
+
+    # Stage its feed time is recorded under when a conversion is timed
+    stage = 'ex_data_extraction'
+
+    def __init__(self, rows=None, capture_title=True):
+        self.rows = [] if rows is None else rows
+        self.capture_title = capture_title
+        self.entry = None
+        self.description = []
+        self.collecting_description = False
+
+    def feed(self, raw_text):
+        text = raw_text.strip()
+        directive = parse_field_directive(text)
+
+        if directive is not None and directive[0] == 'exid':
+            self._close_entry()
+            self.entry = [directive[1], ""]
+            self.collecting_description = False
+        elif directive is not None and directive[0] == 'title' and self.capture_title:
+            self._current_entry()[1] = directive[1]
+            self.collecting_description = False
+        elif directive is not None and directive[0] == 'description':
+            self._current_entry()
+            self.description = [directive[1]]
+            self.collecting_description = True
+        elif directive is not None or "assert" in text:
+            self.collecting_description = False
+        elif self.collecting_description:
+            self.description.append(text)
+
+    def finish(self):
+        self._close_entry()
+        return self.rows
+
+    def state(self):
+        entry = None if self.entry is None else tuple(self.entry)
+        return (entry, tuple(self.description), self.collecting_description)
+
+    def restore(self, state):
+        entry, description, self.collecting_description = state
+        self.entry = None if entry is None else list(entry)
+        self.description = list(description)
+
+    def _current_entry(self):
+        if self.entry is None:
+            self.entry = ["", ""]
+        return self.entry
+
+    def _close_entry(self):
+        if self.entry is not None:
+            exid, title = self.entry
+            description = "\n".join(self.description)
+            self.rows.append(Exercise(exid, title, description, "", "", 0, "", "", "", 0, 0, 0, "", ""))
+            self.entry = None
+            self.description = []
+
+
+class AssertExtractor:
+    """Collects ``assert`` test lines as qa_data ``Question`` records.
+
+    The question column holds the exercise title (``label='title'``, debug
+    mode) or the function name named on the description line
+    (``label='function'``, solver mode).
+    """
+
+    # Stage its feed time is recorded under when a conversion is timed
+    stage = 'qa_data_extraction'
+
+    def __init__(self, rows=None, label='title'):
+        self.rows = [] if rows is None else rows
+        self.label_source = label
+        self.exid = ""
+        self.label = ""
+        self.question_key = 1
+
+    def feed(self, raw_text):
+        text = raw_text.strip()
+        directive = parse_field_directive(text)
+
+        if directive is not None and directive[0] == 'exid':
+            self.exid = directive[1]
+            self.question_key = 1
+            if self.label_source == 'title':
+                self.label = ""
+        elif directive is not None and directive[0] == 'title' and self.label_source == 'title':
+            self.label = directive[1]
+        elif directive is not None and directive[0] == 'description' and self.label_source == 'function':
+            for marker in ("Function", "function"):
+                if marker in text:
+                    words = text[text.find(marker) + len(marker):].split()
+                    if words:
+                        self.label = words[0].rstrip('()')
+                    break
+        elif "assert" in text:
+            self.rows.append(Question(self.exid, self.question_key, self.label, 'assert', "", text, ""))
+            self.question_key += 1
+
+    def finish(self):
+        return self.rows
+
+    def state(self):
+        return (self.exid, self.label, self.question_key)
+
+    def restore(self, state):
+        self.exid, self.label, self.question_key = state
+
+
+# Conversion mode -> factories for its ex_data and qa_data extractors.
+# Each factory takes the row sink to append to; add an entry to plug in a mode.
+CONVERSION_MODES = {
+    'reader': (ExerciseExtractor, QuestionExtractor),
+    'debug': (partial(DescriptionExtractor, capture_title=True), partial(AssertExtractor, label='title')),
+    'solver': (partial(DescriptionExtractor, capture_title=False), partial(AssertExtractor, label='function')),
+}
+
+def mode_extractors(mode, ex_rows=None, qa_rows=None):
+    """Return the ``[ex_data, qa_data]`` extractors of a conversion mode"""
+    try:
+        ex_factory, qa_factory = CONVERSION_MODES[mode]
+    except KeyError:
+        raise ValueError(f"Unknown conversion mode: {mode}")
+    return [ex_factory(ex_rows), qa_factory(qa_rows)]
+
+
+_W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_W_BODY = f"{_W_NS}body"
+_W_P = f"{_W_NS}p"
+_W_R = f"{_W_NS}r"
+_W_HYPERLINK = f"{_W_NS}hyperlink"
+_W_T = f"{_W_NS}t"
+_W_BR = f"{_W_NS}br"
+_W_BR_TYPE = f"{_W_NS}type"
+# Text equivalents of run content elements, mirroring python-docx's Run.text
+_W_RUN_TEXT = {
+    f"{_W_NS}tab": "\t",
+    f"{_W_NS}ptab": "\t",
+    f"{_W_NS}cr": "\n",
+    f"{_W_NS}noBreakHyphen": "-",
+}
+
+def _run_text(run):
+    parts = []
+    for child in run:
+        if child.tag == _W_T:
+            parts.append(child.text or "")
+        elif child.tag == _W_BR:
+            if child.get(_W_BR_TYPE, "textWrapping") == "textWrapping":
+                parts.append("\n")
+        elif child.tag in _W_RUN_TEXT:
+            parts.append(_W_RUN_TEXT[child.tag])
+    return "".join(parts)
+
+def iter_docx_paragraphs(docx_path):
+    """Yield the text of each body paragraph using the python-docx object model"""
+    for para in Document(docx_path).paragraphs:
+        yield para.text
+
+def iter_ooxml_paragraphs(docx_path):
+    """Yield the text of each body paragraph by streaming word/document.xml.
+
+    Reads the part straight from the zip with an incremental parser and frees
+    every paragraph once its text has been produced, so memory stays bounded
+    regardless of document size. Text matches python-docx's ``Paragraph.text``.
+    """
+    with ZipFile(docx_path) as docx_zip, docx_zip.open('word/document.xml') as xml_file:
+        for _, para in etree.iterparse(xml_file, events=('end',), tag=_W_P):
+            parent = para.getparent()
+            if parent.tag == _W_BODY:
+                parts = []
+                for child in para:
+                    if child.tag == _W_R:
+                        parts.append(_run_text(child))
+                    elif child.tag == _W_HYPERLINK:
+                        parts.extend(_run_text(run) for run in child.iterchildren(_W_R))
+                yield "".join(parts)
+
+                # Release this paragraph and everything before it in the body
+                para.clear()
+                while para.getprevious() is not None:
+                    del parent[0]
+
+PARAGRAPH_SOURCES = {
+    'docx': iter_docx_paragraphs,
+    'stream': iter_ooxml_paragraphs,
+}
+
+def iter_paragraphs(docx_path, source='docx'):
+    """Yield paragraph texts from the selected paragraph source ('docx' or 'stream')"""
+    try:
+        paragraph_source = PARAGRAPH_SOURCES[source]
+    except KeyError:
+        raise ValueError(f"Unknown paragraph source: {source}")
+    return paragraph_source(docx_path)
+
+# How often (in paragraphs) progress callbacks are invoked
+PROGRESS_INTERVAL = 1000
+
+def _run_extractors(extractors, docx_path, source, progress):
+    timings = current_timings()
+    if timings is not None:
+        return _run_extractors_timed(extractors, docx_path, source, progress, timings)
+
+    paragraph_count = 0
+    for text in iter_paragraphs(docx_path, source):
+        for extractor in extractors:
+            extractor.feed(text)
+        paragraph_count += 1
+        if progress is not None and paragraph_count % PROGRESS_INTERVAL == 0:
+            progress(paragraph_count)
+
+    if progress is not None:
+        progress(paragraph_count)
+    return tuple(extractor.finish() for extractor in extractors)
+
+# Extractors are timed on one paragraph in this many (prime, so periodic layouts do not alias)
+STAGE_SAMPLE_INTERVAL = 11
+
+def _run_extractors_timed(extractors, docx_path, source, progress, timings):
+    """``_run_extractors`` that also times the document open, paragraph iteration and each extractor.
+
+    The document is read lazily, so the time until the first paragraph counts
+    as opening it. Reading the clock around every extractor call would slow
+    the loop noticeably, so extractors are timed on a sample of paragraphs and
+    their totals extrapolated; iteration gets the rest of the loop's time.
+    """
+    clock = time.perf_counter
+    sampled_seconds = [0.0] * len(extractors)
+    timed_extractors = list(enumerate(extractors))
+    paragraph_count = 0
+
+    start = clock()
+    paragraphs = iter_paragraphs(docx_path, source)
+    first = next(paragraphs, None)
+    opened = clock()
+    if first is not None:
+        paragraphs = chain((first,), paragraphs)
+
+    for text in paragraphs:
+        if paragraph_count % STAGE_SAMPLE_INTERVAL:
+            for extractor in extractors:
+                extractor.feed(text)
+        else:
+            now = clock()
+            for index, extractor in timed_extractors:
+                extractor.feed(text)
+                fed = clock()
+                sampled_seconds[index] += fed - now
+                now = fed
+        paragraph_count += 1
+        if progress is not None and paragraph_count % PROGRESS_INTERVAL == 0:
+            progress(paragraph_count)
+    loop_seconds = clock() - opened
+
+    if progress is not None:
+        progress(paragraph_count)
+    samples = -(-paragraph_count // STAGE_SAMPLE_INTERVAL)
+    scale = paragraph_count / samples if samples else 0.0
+    extractor_seconds = [seconds * scale for seconds in sampled_seconds]
+    iteration_seconds = max(loop_seconds - sum(extractor_seconds), 0.0)
+
+    results = []
+    for index, extractor in timed_extractors:
+        finish_start = clock()
+        results.append(extractor.finish())
+        extractor_seconds[index] += clock() - finish_start
+
+    timings.paragraphs += paragraph_count
+    _record_extraction(timings, extractors, extractor_seconds, opened - start, iteration_seconds)
+    return tuple(results)
+
+def _record_extraction(timings, extractors, extractor_seconds, open_seconds, iteration_seconds):
+    timings.add('docx_open', open_seconds)
+    timings.add('paragraph_iteration', iteration_seconds)
+    # Several extractors may feed one stage, e.g. in a multi-mode conversion
+    stage_seconds = {}
+    for extractor, seconds in zip(extractors, extractor_seconds):
+        stage_seconds[extractor.stage] = stage_seconds.get(extractor.stage, 0.0) + seconds
+    for name, seconds in stage_seconds.items():
+        timings.add(name, seconds)
+
+def extract_document_data(docx_path, include_code=False, source='docx',
+                          ex_rows=None, qa_rows=None, progress=None, mode='reader', workers=1):
+    """Extract ex_data, qa_data and optionally code blocks in a single pass.
+
+    The document is loaded once and every paragraph's text is computed once,
+    then fed to each extractor in turn. Returns ``(ex_data, qa_data)`` or,
+    when ``include_code`` is true, ``(ex_data, qa_data, code_blocks)``.
+    ``source`` selects the paragraph reader (see ``PARAGRAPH_SOURCES``) and
+    ``mode`` the conversion mode (see ``CONVERSION_MODES``);
+    ``ex_rows``/``qa_rows`` receive rows as they are produced instead of lists.
+    ``progress`` is called with the number of paragraphs read so far.
+    With ``workers`` above 1 exid blocks are parsed in that many processes
+    (see ``extract_document_data_parallel``).
+    """
+    if workers != 1:
+        return extract_document_data_parallel(docx_path, workers, include_code=include_code, source=source,
+                                              ex_rows=ex_rows, qa_rows=qa_rows, progress=progress, mode=mode)
+    extractors = mode_extractors(mode, ex_rows, qa_rows)
+    if include_code:
+        extractors.append(CodeBlockExtractor())
+
+    return _run_extractors(extractors, docx_path, source, progress)
+
+def extract_document_tables(docx_path, source='docx', progress=None, mode='reader'):
+    """Extract ex_data and qa_data into columnar tables in a single pass"""
+    return extract_document_data(docx_path, source=source, ex_rows=exercise_table(),
+                                 qa_rows=question_table(), progress=progress, mode=mode)
+
+def sort_tables(ex_table, qa_table, *names):
+    """Sort ex_data by the given columns and reorder qa_data to follow its exercises.
+
+    Questions keep their order within an exercise; questions whose exid has
+    no exercise row stay at the end in their original order.
+    """
+    unknown = [name for name in names if name not in EX_DATA_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown ex_data column: {', '.join(unknown)}")
+
+    ex_sorted = ex_table.sorted_by(*names)
+    groups = qa_table.group_indices('exid')
+    order = [i for exid in ex_sorted.column('exid') for i in groups.pop(exid, ())]
+    order.extend(sorted(i for indices in groups.values() for i in indices))
+    return ex_sorted, qa_table.take(order)
+
+def extract_modes_data(docx_path, modes, include_code=False, source='docx', progress=None):
+    """Extract the ex_data/qa_data of several conversion modes from one parse.
+
+    Returns a dict mapping each mode to its ``(ex_data, qa_data)``, plus the
+    code blocks under ``'code'`` when ``include_code`` is true.
+    """
+    extractors = []
+    for mode in modes:
+        extractors.extend(mode_extractors(mode))
+    if include_code:
+        extractors.append(CodeBlockExtractor())
+
+    results = _run_extractors(extractors, docx_path, source, progress)
+    data = {mode: results[2 * i:2 * i + 2] for i, mode in enumerate(modes)}
+    if include_code:
+        data['code'] = results[-1]
+    return data
+
+def iter_exid_blocks(paragraphs):
+    """Split a paragraph stream into blocks that each start at an ``exid :`` line.
+
+    Text before the first exid forms a leading block of its own.
+    """
+    block = []
+    for text in paragraphs:
+        if block and text.strip().startswith("exid :"):
+            yield block
+            block = []
+        block.append(text)
+    if block:
+        yield block
+
+def block_fingerprint(state, block):
+    """Fingerprint a block by its paragraphs and the extractor state it starts from"""
+    return hashlib.sha256(repr((state, block)).encode('utf-8')).hexdigest()
+
+def extract_document_data_incremental(docx_path, block_cache, include_code=False, source='docx',
+                                      mode='reader', ex_rows=None, qa_rows=None):
+    """Like ``extract_document_data``, but reuses parsed output of unchanged exid blocks.
+
+    Field values carry over between exercises, so each block is fingerprinted
+    together with the extractor state it starts from; ``block_cache`` maps that
+    fingerprint to the rows the block produced and the state it ends in.
+    Rows, cached or not, are appended to ``ex_rows``/``qa_rows`` block by block.
+    Returns ``(data, stats)`` where ``data`` matches ``extract_document_data``
+    and ``stats`` counts blocks reused from the cache versus re-parsed.
+    """
+    extractors = mode_extractors(mode, ex_rows, qa_rows)
+    if include_code:
+        extractors.append(CodeBlockExtractor())
+    outputs = [extractor.rows for extractor in extractors]
+    stats = {'blocks': 0, 'reused': 0, 'reparsed': 0}
+    timings = current_timings()
+    clock = time.perf_counter
+    extractor_seconds = [0.0] * len(extractors)
+    open_seconds = None
+    iteration_seconds = 0.0
+    paragraph_count = 0
+
+    last = clock()
+    for block in iter_exid_blocks(iter_paragraphs(docx_path, source)):
+        if timings is not None:
+            now = clock()
+            if open_seconds is None:
+                open_seconds = now - last
+            else:
+                iteration_seconds += now - last
+            paragraph_count += len(block)
+
+        start_state = (mode, include_code) + tuple(extractor.state() for extractor in extractors)
+        fingerprint = block_fingerprint(start_state, block)
+        cached = block_cache.get(fingerprint)
+
+        if cached is None:
+            emitted = [[] for _ in extractors]
+            for extractor, rows in zip(extractors, emitted):
+                extractor.rows = rows
+            if timings is None:
+                for text in block:
+                    for extractor in extractors:
+                        extractor.feed(text)
+            else:
+                for index, extractor in enumerate(extractors):
+                    start = clock()
+                    for text in block:
+                        extractor.feed(text)
+                    extractor_seconds[index] += clock() - start
+            end_state = tuple(extractor.state() for extractor in extractors)
+            block_cache.put(fingerprint, (emitted, end_state))
+            stats['reparsed'] += 1
+        else:
+            emitted, end_state = cached
+            for extractor, state in zip(extractors, end_state):
+                extractor.restore(state)
+            stats['reused'] += 1
+
+        stats['blocks'] += 1
+        for output, rows in zip(outputs, emitted):
+            for row in rows:
+                output.append(row)
+        last = clock()
+
+    for extractor, output in zip(extractors, outputs):
+        extractor.rows = output
+    if timings is None:
+        return tuple(extractor.finish() for extractor in extractors), stats
+
+    now = clock()
+    if open_seconds is None:
+        open_seconds = now - last
+    else:
+        iteration_seconds += now - last
+    results = []
+    for index, extractor in enumerate(extractors):
+        start = clock()
+        results.append(extractor.finish())
+        extractor_seconds[index] += clock() - start
+    timings.paragraphs += paragraph_count
+    _record_extraction(timings, extractors, extractor_seconds, open_seconds, iteration_seconds)
+    return tuple(results), stats
+
+# Paragraphs of whole exid blocks grouped into one chunk of parallel extraction
+PARALLEL_CHUNK_PARAGRAPHS = 5000
+
+def pool_context():
+    """Multiprocessing context for worker pools started from a threaded server process"""
+    # Forking a process that runs other threads (request handlers, background jobs) can leave
+    # the child holding a lock no thread will release, so start workers from a fork server
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+def _chunk_extractors(mode, include_code):
+    extractors = mode_extractors(mode)
+    if include_code:
+        extractors.append(CodeBlockExtractor())
+    return extractors
+
+def _extract_chunk(args):
+    """Parse one chunk of exid blocks in a worker process.
+
+    The block preceding the chunk is fed first, with its rows discarded, so
+    that carried-over field values reach the state the chunk starts from.
+    Returns that start state, the rows the chunk emitted and its end state.
+    """
+    mode, include_code, warmup, chunk = args
+    extractors = _chunk_extractors(mode, include_code)
+    for text in warmup:
+        for extractor in extractors:
+            extractor.feed(text)
+    start_state = tuple(extractor.state() for extractor in extractors)
+
+    emitted = [[] for _ in extractors]
+    for extractor, rows in zip(extractors, emitted):
+        extractor.rows = rows
+    for text in chunk:
+        for extractor in extractors:
+            extractor.feed(text)
+    return start_state, emitted, tuple(extractor.state() for extractor in extractors)
+
+def _iter_block_chunks(paragraphs, chunk_paragraphs):
+    """Group exid blocks into ``(warmup, chunk)`` pairs of at least ``chunk_paragraphs`` paragraphs.
+
+    ``warmup`` is the last block of the previous chunk, or empty for the first.
+    A block longer than ``chunk_paragraphs`` forms a chunk of its own.
+    """
+    warmup = []
+    chunk = []
+    last_block = []
+    for block in iter_exid_blocks(paragraphs):
+        chunk.extend(block)
+        last_block = block
+        if len(chunk) >= chunk_paragraphs:
+            yield warmup, chunk
+            warmup, chunk = last_block, []
+    if chunk:
+        yield warmup, chunk
+
+def extract_document_data_parallel(docx_path, workers=None, include_code=False, source='docx',
+                                   ex_rows=None, qa_rows=None, progress=None, mode='reader',
+                                   chunk_paragraphs=PARALLEL_CHUNK_PARAGRAPHS):
+    """Like ``extract_document_data``, but parses chunks of exid blocks in a process pool.
+
+    The paragraph stream is split at exid boundaries into chunks of about
+    ``chunk_paragraphs`` paragraphs; workers parse them while the document is
+    still being read, and rows are merged in document order. Each worker
+    guesses the extractor state its chunk starts from by re-reading the
+    preceding block; when the guess differs from the state the previous chunk
+    actually ended in (a field carried over across several exercises), the
+    chunk is re-parsed here from the right state, so the output is always
+    identical to the sequential path.
+    """
+    extractors = _chunk_extractors(mode, include_code)
+    if ex_rows is not None:
+        extractors[0].rows = ex_rows
+    if qa_rows is not None:
+        extractors[1].rows = qa_rows
+    workers = workers or os.cpu_count() or 1
+    chunks = reparsed = paragraph_count = 0
+    pending = deque()
+
+    def merge(warmup, chunk, future):
+        nonlocal reparsed
+        start_state, emitted, end_state = future.result()
+        if start_state == tuple(extractor.state() for extractor in extractors):
+            for extractor, rows in zip(extractors, emitted):
+                for row in rows:
+                    extractor.rows.append(row)
+            for extractor, state in zip(extractors, end_state):
+                extractor.restore(state)
+        else:
+            reparsed += 1
+            for text in chunk:
+                for extractor in extractors:
+                    extractor.feed(text)
+
+    with stage('parallel_extraction'), ProcessPoolExecutor(max_workers=workers, mp_context=pool_context()) as executor:
+        for warmup, chunk in _iter_block_chunks(iter_paragraphs(docx_path, source), chunk_paragraphs):
+            # Keep a couple of chunks per worker in flight so memory stays bounded
+            if len(pending) >= 2 * workers:
+                merge(*pending.popleft())
+            pending.append((warmup, chunk, executor.submit(_extract_chunk, (mode, include_code, warmup, chunk))))
+            chunks += 1
+            paragraph_count += len(chunk)
+            if progress is not None:
+                progress(paragraph_count)
+        while pending:
+            merge(*pending.popleft())
+        results = tuple(extractor.finish() for extractor in extractors)
+
+    timings = current_timings()
+    if timings is not None:
+        timings.paragraphs += paragraph_count
+    logger.debug(f"Parallel extraction: {chunks} chunks on {workers} workers, {reparsed} re-parsed in order")
+    return results
+
+def _iter_records(extractor_class, docx_path, source):
+    pending = []
+    extractor = extractor_class(pending)
+    for text in iter_paragraphs(docx_path, source):
+        extractor.feed(text)
+        if pending:
+            yield from pending
+            pending.clear()
+    extractor.finish()
+    yield from pending
+
+def iter_exercises(docx_path, source='docx'):
+    """Yield an ``Exercise`` record as soon as each exercise block closes.
+
+    Stopping early (e.g. with ``itertools.islice``) stops reading the document.
+    """
+    return _iter_records(ExerciseExtractor, docx_path, source)
+
+def iter_questions(docx_path, source='docx'):
+    """Yield a ``Question`` record as soon as each question line is parsed"""
+    return _iter_records(QuestionExtractor, docx_path, source)
+
+def table_to_dataframe(table, pd):
+    """Build a DataFrame column by column; dictionary-encoded columns become categoricals"""
+    data = {}
+    for name, column in table.columns.items():
+        if name in table.dictionary_columns:
+            data[name] = pd.Categorical.from_codes(column.codes, categories=column.values)
+        else:
+            data[name] = column
+    return pd.DataFrame(data, columns=list(table.record._fields))
+
+def extract_dataframes(docx_path, source='docx'):
+    """Extract ex_data and qa_data as pandas DataFrames.
+
+    pandas is an optional dependency and is only imported when this is called.
+    """
     try:
-        # Extract data from the Word document
-        sheet1_data = extract_sheet1_data_from_docx(input_path)
-        sheet2_data = extract_sheet2_data_from_docx(input_path)
-
-        # Create DataFrames for Sheet1 and Sheet2
-        columns_sheet1 = ['exid', 'title', 'description', 'category', 'subcategoryid', 
-                         'level', 'language', 'qlocation', 'module', 'ex_seq', 
-                         'cat_seq', 'subcat_seq', 'league', 'labels']
-        columns_sheet2 = ['exid', 'key', 'question', 'type', 'options', 'answer']
-
-        df_sheet1 = pd.DataFrame(sheet1_data, columns=columns_sheet1)
-        df_sheet2 = pd.DataFrame(sheet2_data, columns=columns_sheet2)
-
-        # Write to Excel file
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-            df_sheet1.to_excel(writer, sheet_name='ex_data', index=False)
-            df_sheet2.to_excel(writer, sheet_name='qa_data', index=False)
-
-        logger.info(f"Successfully converted {input_path} to Excel")
-        logger.info(f"Sheet1 rows: {len(df_sheet1)}")
-        logger.info(f"Sheet2 rows: {len(df_sheet2)}")
+        import pandas as pd
+    except ImportError:
+        raise ImportError("DataFrame results require pandas: pip install 'repl-nix-workspace[dataframe]'")
+
+    sheet1_table, sheet2_table = extract_document_tables(docx_path, source=source)
+    return table_to_dataframe(sheet1_table, pd), table_to_dataframe(sheet2_table, pd)
+
+def extract_sheet1_data_from_docx(docx_path, source='docx', workers=1):
+    """Extract data from the Word document for Sheet1"""
+    return extract_document_data(docx_path, source=source, workers=workers)[0]
+
+def extract_sheet2_data_from_docx(docx_path, source='docx', workers=1):
+    """Extract questions and answers from the Word document for Sheet2"""
+    return extract_document_data(docx_path, source=source, workers=workers)[1]
+
+def extract_code_blocks_from_docx(docx_path, source='docx', progress=None):
+    """Extract code blocks and their qlocation file names from the Word document"""
+    return _run_extractors([CodeBlockExtractor()], docx_path, source, progress)[0]
+
+# Header style of the ex_data/qa_data sheets, as previously written by pandas
+HEADER_FONT = Font(bold=True)
+HEADER_BORDER = Border(left=Side(style='thin'), right=Side(style='thin'),
+                       top=Side(style='thin'), bottom=Side(style='thin'))
+HEADER_ALIGNMENT = Alignment(horizontal='center', vertical='top')
+
+class WorksheetRows:
+    """Append-only row sink that writes straight into a write-only worksheet"""
+
+    def __init__(self, worksheet, columns):
+        self.worksheet = worksheet
+        self.count = 0
+
+        header = []
+        for column in columns:
+            cell = WriteOnlyCell(worksheet, value=column)
+            cell.font = HEADER_FONT
+            cell.border = HEADER_BORDER
+            cell.alignment = HEADER_ALIGNMENT
+            header.append(cell)
+        worksheet.append(header)
+
+    def append(self, row):
+        # Empty strings and NaN are written as blank cells
+        self.worksheet.append([value if value == value and value != "" else None for value in row])
+        self.count += 1
+
+    def __len__(self):
+        return self.count
+
+class ExcelWorkbookWriter:
+    """Streams ex_data and qa_data rows into a constant-memory openpyxl workbook"""
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.workbook = Workbook(write_only=True)
+        self.ex_data = WorksheetRows(self.workbook.create_sheet('ex_data'), EX_DATA_COLUMNS)
+        self.qa_data = WorksheetRows(self.workbook.create_sheet('qa_data'), QA_DATA_COLUMNS)
+
+    def save(self):
+        self.workbook.save(self.output_path)
+
+    def discard(self):
+        """Abandon the workbook without writing it"""
+        for worksheet in self.workbook.worksheets:
+            worksheet.close()
+
+# Text sheets are kept in memory up to this size before spilling to a temporary file
+SPOOL_MAX_BYTES = 16 * 1024 * 1024
+
+class SpooledRows:
+    """Append-only row sink that formats rows into a spooled text file"""
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.buffer = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES, mode='w+',
+                                                    encoding='utf-8', newline='')
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def copy_to(self, binary_file, chunk_size=1024 * 1024):
+        self.buffer.seek(0)
+        for chunk in iter(lambda: self.buffer.read(chunk_size), ''):
+            binary_file.write(chunk.encode('utf-8'))
+
+    def close(self):
+        self.buffer.close()
+
+class CsvRows(SpooledRows):
+    """Writes rows as CSV with a header line"""
+
+    def __init__(self, columns):
+        super().__init__(columns)
+        self.writer = csv.writer(self.buffer)
+        self.writer.writerow(columns)
+
+    def append(self, row):
+        self.writer.writerow(row)
+        self.count += 1
+
+class JsonLinesRows(SpooledRows):
+    """Writes each row as a JSON object keyed by column name, one per line"""
+
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+
+    def append(self, row):
+        self.buffer.write(self.encode(dict(zip(self.columns, row))))
+        self.buffer.write("\n")
+        self.count += 1
+
+class ZippedSheetsWriter:
+    """Streams ex_data and qa_data into one text file per sheet and zips them on save"""
+
+    rows_class = None
+    extension = None
+
+    def __init__(self, output):
+        self.output = output
+        self.ex_data = self.rows_class(EX_DATA_COLUMNS)
+        self.qa_data = self.rows_class(QA_DATA_COLUMNS)
+
+    def save(self):
+        with ZipFile(self.output, 'w', ZIP_DEFLATED) as zipf:
+            for sheet, rows in (('ex_data', self.ex_data), ('qa_data', self.qa_data)):
+                with zipf.open(f"{sheet}{self.extension}", 'w') as member:
+                    rows.copy_to(member)
+        self.discard()
+
+    def discard(self):
+        self.ex_data.close()
+        self.qa_data.close()
+
+class CsvZipWriter(ZippedSheetsWriter):
+    """Writes ex_data.csv and qa_data.csv into a zip"""
+
+    rows_class = CsvRows
+    extension = '.csv'
+
+class JsonLinesZipWriter(ZippedSheetsWriter):
+    """Writes ex_data.jsonl and qa_data.jsonl into a zip"""
+
+    rows_class = JsonLinesRows
+    extension = '.jsonl'
+
+class ParquetZipWriter:
+    """Collects ex_data and qa_data in columnar tables and writes a Parquet file per sheet on save.
+
+    pyarrow is an optional dependency, imported when the writer is created.
+    Dictionary-encoded columns become Parquet dictionary columns; the answer
+    column, which mixes numbers and text, is written as strings.
+    """
+
+    def __init__(self, output):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("Parquet output requires pyarrow: pip install pyarrow")
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.output = output
+        self.ex_data = exercise_table()
+        self.qa_data = question_table()
+
+    def _arrow_table(self, table):
+        pa = self.pa
+        arrays = []
+        for name, column in table.columns.items():
+            if name in table.dictionary_columns:
+                arrays.append(pa.DictionaryArray.from_arrays(pa.array(column.codes, pa.int32()),
+                                                             pa.array(column.values, pa.string())))
+            elif isinstance(column, array):
+                arrays.append(pa.array(column, pa.int64()))
+            else:
+                arrays.append(pa.array([value if isinstance(value, str) else str(value) for value in column],
+                                       pa.string()))
+        return pa.Table.from_arrays(arrays, names=list(table.record._fields))
+
+    def save(self):
+        with ZipFile(self.output, 'w') as zipf:
+            for sheet, table in (('ex_data', self.ex_data), ('qa_data', self.qa_data)):
+                sink = self.pa.BufferOutputStream()
+                self.pq.write_table(self._arrow_table(table), sink)
+                zipf.writestr(f"{sheet}.parquet", sink.getvalue().to_pybytes())
+
+    def discard(self):
+        pass
+
+# Output format -> writer class, download suffix, mimetype and optional module it needs
+OutputFormat = namedtuple('OutputFormat', ['writer', 'suffix', 'mimetype', 'requires'])
+OUTPUT_FORMATS = {
+    'xlsx': OutputFormat(ExcelWorkbookWriter, '.xlsx',
+                         'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', None),
+    'csv': OutputFormat(CsvZipWriter, '_csv.zip', 'application/zip', None),
+    'jsonl': OutputFormat(JsonLinesZipWriter, '_jsonl.zip', 'application/zip', None),
+    'parquet': OutputFormat(ParquetZipWriter, '_parquet.zip', 'application/zip', 'pyarrow'),
+}
+
+def available_output_formats():
+    """Output formats whose optional dependencies are installed"""
+    return [name for name, fmt in OUTPUT_FORMATS.items()
+            if fmt.requires is None or importlib.util.find_spec(fmt.requires) is not None]
+
+def open_writer(output_format, output):
+    """Create the writer for an output format; ``output`` is a path or binary file object"""
+    try:
+        return OUTPUT_FORMATS[output_format].writer(output)
+    except KeyError:
+        raise ValueError(f"Unknown output format: {output_format}")
+
+def write_rows(sheet1_data, sheet2_data, output, output_format='xlsx'):
+    """Write extracted ex_data and qa_data rows or columnar tables in an output format"""
+    with stage('workbook_write'):
+        writer = open_writer(output_format, output)
+        for row in sheet1_data:
+            writer.ex_data.append(row)
+        for row in sheet2_data:
+            writer.qa_data.append(row)
+        writer.save()
+
+def write_excel_workbook(sheet1_data, sheet2_data, output_path):
+    """Write extracted ex_data and qa_data rows or columnar tables to an Excel workbook"""
+    write_rows(sheet1_data, sheet2_data, output_path, 'xlsx')
+
+def convert_document(input_path, output, output_format='xlsx', source='docx', progress=None,
+                     block_cache=None, mode='reader', workers=1):
+    """Convert a Word document's exercise and QA data into an output format.
+
+    ``output_format`` selects the writer (see ``OUTPUT_FORMATS``) and ``mode``
+    the conversion mode (see ``CONVERSION_MODES``). With a ``block_cache`` only
+    exid blocks that changed since an earlier conversion are re-parsed; the
+    rest are reassembled from cached rows. Otherwise ``workers`` above 1
+    parses exid blocks in that many processes.
+    """
+    try:
+        # Stream rows from a single pass over the document straight into the writer
+        writer = open_writer(output_format, output)
+        try:
+            if block_cache is not None:
+                (sheet1_data, sheet2_data), stats = extract_document_data_incremental(
+                    input_path, block_cache, source=source, mode=mode,
+                    ex_rows=writer.ex_data, qa_rows=writer.qa_data
+                )
+                logger.info(f"Reused {stats['reused']} of {stats['blocks']} blocks, "
+                            f"re-parsed {stats['reparsed']}")
+            else:
+                sheet1_data, sheet2_data = extract_document_data(
+                    input_path, source=source, ex_rows=writer.ex_data, qa_rows=writer.qa_data,
+                    progress=progress, mode=mode, workers=workers
+                )
+        except Exception:
+            writer.discard()
+            raise
+        with stage('workbook_write'):
+            writer.save()
+
+        logger.info(f"Successfully converted {input_path} to {output_format} using {mode} mode")
+        logger.info(f"Sheet1 rows: {len(sheet1_data)}")
+        logger.info(f"Sheet2 rows: {len(sheet2_data)}")
         return True
 
     except Exception as e:
         logger.error(f"Error converting file: {str(e)}")
         raise
 
-def create_text_files(input_path):
-    """Creates text files from code blocks in a Word document and returns a zip file path."""
+def convert_word_to_excel(input_path, output_path, source='docx', progress=None, block_cache=None,
+                          mode='reader'):
+    """Convert Word document to Excel format with exercise and QA data"""
+    return convert_document(input_path, output_path, 'xlsx', source=source, progress=progress,
+                            block_cache=block_cache, mode=mode)
+
+def convert_word_to_excel_modes(input_path, outputs, source='docx', progress=None, output_format='xlsx'):
+    """Convert a Word document into one output per conversion mode from a single parse.
+
+    ``outputs`` maps each mode to its output path or binary file object.
+    """
+    for mode in outputs:
+        if mode not in CONVERSION_MODES:
+            raise ValueError(f"Unknown conversion mode: {mode}")
+
+    writers = {mode: open_writer(output_format, output) for mode, output in outputs.items()}
+    extractors = []
+    for mode, writer in writers.items():
+        extractors.extend(mode_extractors(mode, writer.ex_data, writer.qa_data))
+
     try:
-        doc = Document(input_path)
-        temp_dir = tempfile.mkdtemp()
-
-        # Extract code blocks
-        queries = []
-        collecting_code = False
-        current_code = []
-        qlocation = None
-
-        for para in doc.paragraphs:
-            text = para.text.rstrip()  # Only remove trailing whitespace
-
-            if text.lstrip().startswith("qlocation :"):
-                qlocation = text.split("qlocation :")[1].strip()
-                if not qlocation.endswith('.txt'):
-                    qlocation = f"{qlocation}.txt"
-
-            elif text.lstrip().startswith("Code:"):
-                collecting_code = True
-                current_code = []
-
-            elif collecting_code and "Answer the following questions:" in text:
-                if current_code and qlocation:
-                    # Join lines preserving original indentation
-                    code_content = "\n".join(current_code)
-                    queries.append({
-                        "qlocation": qlocation,
-                        "code": code_content
-                    })
-                collecting_code = False
-                current_code = []
-
-            elif collecting_code:
-                # Preserve empty lines and original indentation
-                current_code.append(text)
+        _run_extractors(extractors, input_path, source, progress)
+    except Exception as e:
+        for writer in writers.values():
+            writer.discard()
+        logger.error(f"Error converting file: {str(e)}")
+        raise
 
-        # Add the last code block if exists
-        if collecting_code and current_code and qlocation:
-            code_content = "\n".join(current_code)
-            queries.append({
-                "qlocation": qlocation,
-                "code": code_content
-            })
+    for mode, writer in writers.items():
+        with stage('workbook_write'):
+            writer.save()
+        logger.info(f"{mode} mode: {len(writer.ex_data)} ex_data rows, {len(writer.qa_data)} qa_data rows")
+    return True
+
+def write_mode_workbooks_zip(input_path, modes, output, name, source='docx', progress=None,
+                             output_format='xlsx'):
+    """Convert a document in several modes from one parse and zip the outputs.
+
+    Each output is stored as ``<name>_<mode><suffix>`` in the zip at ``output``,
+    a path or binary file object, with the suffix of ``output_format``.
+    """
+    buffers = {mode: io.BytesIO() for mode in modes}
+    convert_word_to_excel_modes(input_path, buffers, source=source, progress=progress,
+                                output_format=output_format)
+    suffix = OUTPUT_FORMATS[output_format].suffix
+    with stage('zip_build'), ZipFile(output, 'w') as zipf:
+        for mode, buffer in buffers.items():
+            zipf.writestr(f"{name}_{mode}{suffix}", buffer.getvalue())
+
+def write_code_zip(queries, output):
+    """Write code blocks into a zip archive at ``output``, a path or binary file object.
+
+    Each block is added straight from memory, named by its qlocation.
+    """
+    with stage('zip_build'), ZipFile(output, 'w') as zipf:
+        for query in queries:
+            zipf.writestr(query["qlocation"], query["code"])
+
+def build_code_zip(input_path, queries=None, source='docx', progress=None):
+    """Builds the code-files zip for a Word document in memory and returns it as a BytesIO"""
+    try:
+        if queries is None:
+            queries = extract_code_blocks_from_docx(input_path, source=source, progress=progress)
+        buffer = io.BytesIO()
+        write_code_zip(queries, buffer)
+        buffer.seek(0)
+        return buffer
+
+    except Exception as e:
+        logger.error(f"Error creating text files: {str(e)}")
+        raise
+
+def create_text_files(input_path, queries=None, source='docx', zip_path=None, progress=None):
+    """Creates text files from code blocks in a Word document and returns a zip file path.
+
+    Pass ``queries`` (as returned by ``extract_document_data(..., include_code=True)``)
+    to reuse code blocks from an earlier single-pass parse instead of reopening the document.
+    Without ``zip_path`` the archive goes to a new temporary file, which the caller removes.
+    """
+    try:
+        if queries is None:
+            queries = extract_code_blocks_from_docx(input_path, source=source, progress=progress)
 
-        # Create zip file with text files
-        zip_path = os.path.join(tempfile.gettempdir(), 'code_files.zip')
-        with ZipFile(zip_path, 'w') as zipf:
-            for query in queries:
-                file_path = os.path.join(temp_dir, query["qlocation"])
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(query["code"])
-                zipf.write(file_path, query["qlocation"])
-
-        # Clean up temporary directory
-        shutil.rmtree(temp_dir)
+        if zip_path is None:
+            fd, zip_path = tempfile.mkstemp(prefix='code_files_', suffix='.zip')
+            os.close(fd)
+        write_code_zip(queries, zip_path)
         return zip_path
 
     except Exception as e:
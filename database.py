@@ -0,0 +1,179 @@
+import logging
+import threading
+import time
+from sqlalchemy import BigInteger, Column, MetaData, String, Table, Text, create_engine, delete, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from converter import (EX_DATA_COLUMNS, EX_DATA_INT_COLUMNS, QA_DATA_COLUMNS, QA_DATA_INT_COLUMNS,
+                       extract_document_data)
+from metrics import stage
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Rows sent to the database per multi-row INSERT
+DB_BATCH_SIZE = 1000
+
+def _column(name, int_columns, primary_key):
+    if name == 'exid':
+        column_type = String(255)
+    else:
+        # 64-bit, like the columnar integer arrays
+        column_type = BigInteger if name in int_columns else Text
+    return Column(name, column_type, primary_key=name in primary_key)
+
+# Tables mirror the ex_data and qa_data sheets. The mixed-type answer column is stored as text.
+metadata = MetaData()
+ex_data_table = Table('ex_data', metadata,
+                      *(_column(name, EX_DATA_INT_COLUMNS, ('exid',)) for name in EX_DATA_COLUMNS))
+qa_data_table = Table('qa_data', metadata,
+                      *(_column(name, QA_DATA_INT_COLUMNS, ('exid', 'key')) for name in QA_DATA_COLUMNS))
+
+# Dialect name -> insert construct supporting ON CONFLICT; other databases delete then insert
+UPSERT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+def get_engine(database_url):
+    """Return this process's engine for a database URL, creating its tables on first use"""
+    # Hosted Postgres often hands out postgres:// URLs, which SQLAlchemy no longer accepts
+    if database_url.startswith('postgres://'):
+        database_url = 'postgresql://' + database_url[len('postgres://'):]
+    with _engines_lock:
+        engine = _engines.get(database_url)
+        if engine is None:
+            engine = create_engine(database_url)
+            metadata.create_all(engine)
+            _engines[database_url] = engine
+        return engine
+
+
+class DatabaseRows:
+    """Append sink that hands rows to a loader in batches"""
+
+    def __init__(self, load, batch_size):
+        self.load = load
+        self.batch_size = batch_size
+        self.pending = []
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, row):
+        self.pending.append(row)
+        self.count += 1
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.load(self.pending)
+            self.pending = []
+
+
+class DatabaseWriter:
+    """Loads ex_data and qa_data rows into database tables in one transaction.
+
+    Has the same ``ex_data``/``qa_data``/``save``/``discard`` interface as the
+    file writers, so extraction streams straight into it. Exercises are
+    upserted on exid and each loaded exid's questions replace the ones already
+    stored, so re-loading a document updates it in place. ``database`` is a
+    URL or an engine; nothing is visible to other connections until ``save``.
+    """
+
+    def __init__(self, database, batch_size=DB_BATCH_SIZE):
+        engine = get_engine(database) if isinstance(database, str) else database
+        self.connection = engine.connect()
+        self.transaction = self.connection.begin()
+        self.upsert = self._upsert_statement()
+        self.exids = set()
+        self.cleared_exids = set()
+        self.ex_data = DatabaseRows(self._load_exercises, batch_size)
+        self.qa_data = DatabaseRows(self._load_questions, batch_size)
+
+    def _upsert_statement(self):
+        make_insert = UPSERT_INSERTS.get(self.connection.dialect.name)
+        if make_insert is None:
+            return None
+        statement = make_insert(ex_data_table)
+        return statement.on_conflict_do_update(
+            index_elements=['exid'],
+            set_={name: statement.excluded[name] for name in EX_DATA_COLUMNS[1:]}
+        )
+
+    def _load_exercises(self, rows):
+        # Upserting the same exid twice in one load would silently drop a row
+        batch_exids = [row[0] for row in rows]
+        for exid in batch_exids:
+            if exid in self.exids:
+                raise ValueError(f"Duplicate exid: {exid}")
+            self.exids.add(exid)
+
+        params = [dict(zip(EX_DATA_COLUMNS, row)) for row in rows]
+        if self.upsert is not None:
+            self.connection.execute(self.upsert, params)
+        else:
+            self.connection.execute(delete(ex_data_table).where(ex_data_table.c.exid.in_(batch_exids)))
+            self.connection.execute(insert(ex_data_table), params)
+
+    def _load_questions(self, rows):
+        new_exids = {row[0] for row in rows} - self.cleared_exids
+        if new_exids:
+            self.connection.execute(delete(qa_data_table).where(qa_data_table.c.exid.in_(new_exids)))
+            self.cleared_exids.update(new_exids)
+
+        params = []
+        for row in rows:
+            values = dict(zip(QA_DATA_COLUMNS, row))
+            values['answer'] = str(values['answer'])
+            params.append(values)
+        self.connection.execute(insert(qa_data_table), params)
+
+    def _clear_questionless_exercises(self):
+        """Delete the stored questions of loaded exercises that have none in this load"""
+        exids = sorted(self.exids - self.cleared_exids)
+        for start in range(0, len(exids), self.ex_data.batch_size):
+            batch = exids[start:start + self.ex_data.batch_size]
+            self.connection.execute(delete(qa_data_table).where(qa_data_table.c.exid.in_(batch)))
+        self.cleared_exids.update(exids)
+
+    def save(self):
+        try:
+            self.ex_data.flush()
+            self.qa_data.flush()
+            self._clear_questionless_exercises()
+            self.transaction.commit()
+        except Exception:
+            self.discard()
+            raise
+        self.connection.close()
+
+    def discard(self):
+        if self.transaction.is_active:
+            self.transaction.rollback()
+        self.connection.close()
+
+
+def load_document(docx_path, database, source='docx', progress=None, mode='reader'):
+    """Extract a Word document and load its rows into the database; returns load statistics"""
+    start = time.perf_counter()
+    writer = DatabaseWriter(database)
+    try:
+        extract_document_data(docx_path, source=source, ex_rows=writer.ex_data, qa_rows=writer.qa_data,
+                              progress=progress, mode=mode)
+    except Exception:
+        writer.discard()
+        raise
+    with stage('database_write'):
+        writer.save()
+
+    elapsed = time.perf_counter() - start
+    stats = {'ex_data': len(writer.ex_data), 'qa_data': len(writer.qa_data), 'seconds': elapsed}
+    logger.info(f"Loaded {stats['ex_data']} exercises and {stats['qa_data']} questions "
+                f"from {docx_path} in {elapsed:.2f}s")
+    return stats
@@ -0,0 +1,37 @@
+"""Production gunicorn settings, loaded with ``gunicorn --config gunicorn.conf.py main:app``.
+
+Every value can be overridden from the environment so deployments can be
+tuned without editing this file.
+"""
+import os
+import multiprocessing
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# Import the app (python-docx, lxml, openpyxl) once in the master so workers
+# share those pages copy-on-write, and so the job queue, caches and admission
+# ledger pick one shared working directory before forking
+preload_app = True
+
+# Conversion is CPU-bound and holds the GIL, so use one synchronous process
+# per core rather than threads or async workers
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'sync'
+
+# Large documents can take a while to convert; async=1 uploads avoid the limit
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers periodically to cap memory growth from large conversions
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 500))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 50))
+
+# Request line and header limits; the body size is capped by MAX_UPLOAD_BYTES in app.py
+limit_request_line = 4094
+limit_request_fields = 100
+limit_request_field_size = 8190
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
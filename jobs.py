@@ -0,0 +1,263 @@
+import os
+import json
+import logging
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from admission import estimate_cost, process_exists
+from converter import OUTPUT_FORMATS, convert_document, create_text_files, write_mode_workbooks_zip
+from metrics import stage, timed_conversion
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Job kinds -> (output suffix, mimetype)
+JOB_OUTPUTS = {
+    'excel': ('.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'code': ('_code_files.zip', 'application/zip'),
+    'modes': ('_modes.zip', 'application/zip'),
+}
+
+class JobQueueFull(Exception):
+    """Raised when the queue already holds its maximum number of unfinished jobs"""
+
+
+class Job:
+    """State of one background conversion"""
+
+    def __init__(self, kind, work_dir, download_name, modes=('reader',), output_format='xlsx'):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.modes = list(modes)
+        self.output_format = output_format
+        self.input_path = os.path.join(work_dir, f"{self.id}.docx")
+        self.output_path = os.path.join(work_dir, f"{self.id}{self.output_suffix}")
+        self.download_name = download_name
+        # A single-mode conversion is served in its output format
+        self.mimetype = OUTPUT_FORMATS[output_format].mimetype if kind == 'excel' else JOB_OUTPUTS[kind][1]
+        self.status = 'queued'
+        self.paragraphs = 0
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # Worker process running the job, so others can tell when it has died
+        self.pid = os.getpid()
+
+    @property
+    def output_suffix(self):
+        return OUTPUT_FORMATS[self.output_format].suffix if self.kind == 'excel' else JOB_OUTPUTS[self.kind][0]
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'modes': self.modes,
+            'output_format': self.output_format,
+            'status': self.status,
+            'paragraphs': self.paragraphs,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+    def save(self, path):
+        """Atomically write the job state so other worker processes can read it"""
+        state = self.to_dict()
+        state['download_name'] = self.download_name
+        state['pid'] = self.pid
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path, work_dir):
+        """Rebuild a job from the state file written by save()"""
+        with open(path) as f:
+            state = json.load(f)
+        job = cls(state['kind'], work_dir, state['download_name'], state['modes'], state['output_format'])
+        job.id = state['id']
+        job.input_path = os.path.join(work_dir, f"{job.id}.docx")
+        job.output_path = os.path.join(work_dir, f"{job.id}{job.output_suffix}")
+        for field in ('status', 'paragraphs', 'error', 'created_at', 'started_at', 'finished_at'):
+            setattr(job, field, state[field])
+        job.pid = state.get('pid')
+        return job
+
+
+class JobQueue:
+    """In-process conversion queue backed by a bounded thread pool.
+
+    At most ``max_workers`` conversions run at once and at most ``max_pending``
+    jobs may be unfinished; finished jobs and their results are dropped
+    ``ttl`` seconds after they complete. No external broker is needed.
+    Unfinished jobs whose worker process has exited (e.g. recycled or killed
+    by the server), or that were created more than ``max_runtime`` seconds
+    ago, are marked failed.
+
+    With an ``admission`` controller, each job reserves its estimated memory
+    in that budget before it starts, waiting in line with inline conversions.
+
+    Job state is also written to ``<id>.json`` in ``work_dir``. When the queue
+    is created before a pre-forking server forks its workers, every worker
+    shares that directory and can answer status and result requests for jobs
+    that another worker ran.
+    """
+
+    def __init__(self, max_workers=2, max_pending=16, ttl=3600, work_dir=None, max_runtime=3600,
+                 admission=None):
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.max_runtime = max_runtime
+        self.admission = admission
+        self.work_dir = work_dir or tempfile.mkdtemp(prefix='conversion_jobs_')
+        os.makedirs(self.work_dir, exist_ok=True)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='conversion')
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def submit(self, kind, file_storage, download_name, modes=('reader',), output_format='xlsx'):
+        """Save an uploaded file and queue its conversion; returns the new Job"""
+        self.expire()
+        with self.lock:
+            unfinished = sum(1 for job in self.jobs.values() if not job.finished)
+            if unfinished >= self.max_pending:
+                raise JobQueueFull(f"{unfinished} conversions already pending")
+
+            job = Job(kind, self.work_dir, download_name, modes, output_format)
+            with stage('upload_save'):
+                file_storage.save(job.input_path)
+            self.jobs[job.id] = job
+            job.save(self._state_path(job.id))
+
+        self.executor.submit(self._run, job)
+        logger.info(f"Queued {kind} job {job.id} for {download_name}")
+        return job
+
+    def get(self, job_id):
+        """Return the job with this id, or None if it is unknown or expired"""
+        self.expire()
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is not None:
+            return job
+
+        # Fall back to state written by another worker process
+        if len(job_id) != 32 or not all(c in '0123456789abcdef' for c in job_id):
+            return None
+        try:
+            return Job.load(self._state_path(job_id), self.work_dir)
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+    def expire(self):
+        """Fail abandoned jobs, drop finished jobs older than the TTL and delete their files"""
+        now = time.time()
+        cutoff = now - self.ttl
+        expired = []
+        for entry in os.scandir(self.work_dir):
+            if not entry.name.endswith('.json'):
+                continue
+            try:
+                job = Job.load(entry.path, self.work_dir)
+            except (FileNotFoundError, ValueError, KeyError):
+                continue
+            if not job.finished:
+                reason = self._abandoned(job, now)
+                if reason:
+                    self._fail(job, reason, now)
+            elif job.finished_at < cutoff:
+                expired.append(job)
+
+        with self.lock:
+            for job in expired:
+                self.jobs.pop(job.id, None)
+
+        for job in expired:
+            for path in (job.output_path, self._state_path(job.id)):
+                if os.path.exists(path):
+                    os.unlink(path)
+            logger.debug(f"Expired job {job.id}")
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def _abandoned(self, job, now):
+        """Return why an unfinished job will never finish, or None while it still may"""
+        if now - job.created_at > self.max_runtime:
+            return f"Conversion did not finish within {self.max_runtime} seconds"
+        if job.pid is not None and not process_exists(job.pid):
+            return "Conversion worker exited before the job finished"
+        return None
+
+    def _fail(self, job, reason, now):
+        with self.lock:
+            job = self.jobs.get(job.id, job)
+        logger.warning(f"Job {job.id} failed: {reason}")
+        job.error = reason
+        job.finished_at = now
+        job.status = 'failed'
+        job.save(self._state_path(job.id))
+        if os.path.exists(job.input_path):
+            os.unlink(job.input_path)
+
+    def _state_path(self, job_id):
+        return os.path.join(self.work_dir, f"{job_id}.json")
+
+    def _admit(self, job):
+        """Reserve the job's estimated memory in the admission budget; the job stays queued until then"""
+        if self.admission is None or not self.admission.enabled:
+            return nullcontext()
+        cost = estimate_cost(job.input_path)
+        return self.admission.admit(cost.memory_bytes, queue_seconds=self.max_runtime)
+
+    def _run(self, job):
+        state_path = self._state_path(job.id)
+
+        def update_progress(paragraph_count):
+            job.paragraphs = paragraph_count
+            job.save(state_path)
+
+        status = 'failed'
+        try:
+            with self._admit(job):
+                job.status = 'running'
+                job.started_at = time.time()
+                job.save(state_path)
+                with timed_conversion(os.path.getsize(job.input_path)):
+                    self._convert(job, update_progress)
+            status = 'done'
+            logger.info(f"Job {job.id} finished ({job.paragraphs} paragraphs)")
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {str(e)}", exc_info=True)
+            job.error = str(e)
+        finally:
+            if os.path.exists(job.input_path):
+                os.unlink(job.input_path)
+            # Set the finish time first so expire() never sees a finished job without one
+            job.finished_at = time.time()
+            job.status = status
+            job.save(state_path)
+
+    def _convert(self, job, update_progress):
+        if job.kind == 'excel':
+            convert_document(job.input_path, job.output_path, job.output_format,
+                             progress=update_progress, mode=job.modes[0])
+        elif job.kind == 'modes':
+            name = job.download_name[:-len(JOB_OUTPUTS['modes'][0])]
+            write_mode_workbooks_zip(job.input_path, job.modes, job.output_path, name,
+                                     progress=update_progress, output_format=job.output_format)
+        else:
+            create_text_files(job.input_path, zip_path=job.output_path, progress=update_progress)
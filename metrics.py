@@ -0,0 +1,143 @@
+import os
+import sys
+import bisect
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BYTES_BUCKETS = tuple(16 * 1024 * 4 ** n for n in range(8))             # 16 KB .. 256 MB
+PARAGRAPH_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000)
+MEMORY_BUCKETS = tuple(64 * 1024 * 1024 * 2 ** n for n in range(7))     # 64 MB .. 4 GB
+
+def peak_rss_bytes():
+    """Return this process's peak resident set size so far, or 0 where it is unavailable"""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def current_rss_bytes():
+    """Return this process's resident set size now, or None where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf('SC_PAGE_SIZE')
+
+
+class Histogram:
+    """Prometheus-style histogram with one series per stage label"""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, stage, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            counts = self.series.get(stage)
+            if counts is None:
+                # One count per bucket plus +Inf, then the sum
+                counts = self.series[stage] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = {stage: list(counts) for stage, counts in self.series.items()}
+        for stage, counts in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{stage="{stage}"}} {counts[-1]}')
+            lines.append(f'{self.name}_count{{stage="{stage}"}} {cumulative}')
+        return "\n".join(lines)
+
+
+stage_seconds = Histogram('conversion_stage_seconds', "Time spent in each conversion stage",
+                          SECONDS_BUCKETS)
+stage_input_bytes = Histogram('conversion_stage_input_bytes', "Size of the uploaded document per stage",
+                              BYTES_BUCKETS)
+stage_paragraphs = Histogram('conversion_stage_paragraphs', "Paragraphs read by the end of each stage",
+                             PARAGRAPH_BUCKETS)
+# Current rather than peak RSS: the peak only ever rises, so it would not tell stages apart
+stage_rss = Histogram('conversion_stage_rss_bytes',
+                      "Resident memory of the worker process at the end of each stage", MEMORY_BUCKETS)
+HISTOGRAMS = (stage_seconds, stage_input_bytes, stage_paragraphs, stage_rss)
+
+def render_metrics():
+    """Return every histogram in the Prometheus text exposition format"""
+    return "\n".join(histogram.render() for histogram in HISTOGRAMS) + "\n"
+
+
+class StageTimings:
+    """Stage timings of one conversion, recorded into the histograms as each stage ends"""
+
+    def __init__(self, input_bytes=0):
+        self.input_bytes = input_bytes
+        self.paragraphs = 0
+        self.seconds = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+        stage_seconds.observe(name, seconds)
+        stage_input_bytes.observe(name, self.input_bytes)
+        stage_paragraphs.observe(name, self.paragraphs)
+        rss = current_rss_bytes()
+        if rss is not None:
+            stage_rss.observe(name, rss)
+
+    def server_timing(self):
+        """Format the stages as a Server-Timing header value, in milliseconds"""
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.seconds.items())
+
+
+# Timings of the conversion running in the current request or job, if any
+_current_timings = ContextVar('conversion_timings', default=None)
+
+def current_timings():
+    return _current_timings.get()
+
+def start_timings(input_bytes=0):
+    """Start recording stages for the current context; returns the timings and a reset token"""
+    timings = StageTimings(input_bytes)
+    return timings, _current_timings.set(timings)
+
+def stop_timings(token):
+    _current_timings.reset(token)
+
+@contextmanager
+def timed_conversion(input_bytes=0):
+    """Record the stages of the conversions run inside the block"""
+    timings, token = start_timings(input_bytes)
+    try:
+        yield timings
+    finally:
+        stop_timings(token)
+
+def stage(name):
+    """Time a block as a stage of the current conversion; does nothing outside one"""
+    timings = _current_timings.get()
+    return nullcontext() if timings is None else timings.stage(name)
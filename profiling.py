@@ -0,0 +1,130 @@
+import io
+import os
+import sys
+import time
+import marshal
+import pstats
+import logging
+import argparse
+import cProfile
+import threading
+import tracemalloc
+from zipfile import ZIP_DEFLATED, ZipFile
+from converter import CONVERSION_MODES, OUTPUT_FORMATS, build_code_zip, convert_document
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Functions listed in profile.txt and allocation sites listed in allocations.txt
+PROFILE_TOP_FUNCTIONS = 50
+PROFILE_TOP_ALLOCATIONS = 25
+
+# tracemalloc is process-wide, so only one conversion is profiled at a time
+_profile_lock = threading.Lock()
+
+class ProfilerBusy(Exception):
+    """Raised when another conversion is already being profiled in this process"""
+
+
+class ConversionProfile:
+    """cProfile statistics and tracemalloc allocation sites of one profiled conversion"""
+
+    def __init__(self, profile, snapshot, peak_bytes, seconds):
+        self.profile = profile
+        self.snapshot = snapshot
+        self.peak_bytes = peak_bytes
+        self.seconds = seconds
+
+    def pstats_bytes(self):
+        """The profile in the marshal format read by ``pstats.Stats`` and snakeviz"""
+        self.profile.create_stats()
+        return marshal.dumps(self.profile.stats)
+
+    def stats_text(self, limit=PROFILE_TOP_FUNCTIONS):
+        stream = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+        return stream.getvalue()
+
+    def allocations_text(self, limit=PROFILE_TOP_ALLOCATIONS):
+        snapshot = self.snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ))
+        lines = [
+            f"Conversion took {self.seconds:.3f}s",
+            f"Peak traced memory: {self.peak_bytes / 1e6:,.1f} MB",
+            f"Top {limit} allocation sites still held when the conversion finished:",
+            "",
+        ]
+        for stat in snapshot.statistics('lineno')[:limit]:
+            frame = stat.traceback[0]
+            lines.append(f"{stat.size / 1024:10,.1f} KiB {stat.count:9,} blocks  {frame.filename}:{frame.lineno}")
+        return "\n".join(lines) + "\n"
+
+    def write_zip(self, output, files=()):
+        """Write the profile, plus any ``(name, bytes)`` result files, into a zip at ``output``"""
+        with ZipFile(output, 'w', ZIP_DEFLATED) as zipf:
+            for name, data in files:
+                zipf.writestr(name, data)
+            zipf.writestr('profile.pstats', self.pstats_bytes())
+            zipf.writestr('profile.txt', self.stats_text())
+            zipf.writestr('allocations.txt', self.allocations_text())
+
+
+def profile_call(func, *args, **kwargs):
+    """Run ``func`` under cProfile and tracemalloc; returns its result and a ``ConversionProfile``"""
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusy("Another conversion is already being profiled")
+    try:
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        profile.enable()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            profile.disable()
+            seconds = time.perf_counter() - start
+            snapshot = tracemalloc.take_snapshot()
+            _, peak_bytes = tracemalloc.get_traced_memory()
+            if not tracing:
+                tracemalloc.stop()
+        return result, ConversionProfile(profile, snapshot, peak_bytes, seconds)
+    finally:
+        _profile_lock.release()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile the conversion of one Word document")
+    parser.add_argument('input', help=".docx file to convert")
+    parser.add_argument('-o', '--output', required=True,
+                        help="zip to write the result, profile.pstats, profile.txt and allocations.txt to")
+    parser.add_argument('--code', action='store_true', help="profile code-file extraction instead")
+    parser.add_argument('--mode', choices=sorted(CONVERSION_MODES), default='reader', help="conversion mode")
+    parser.add_argument('--format', choices=sorted(OUTPUT_FORMATS), default='xlsx', dest='output_format',
+                        help="output format")
+    parser.add_argument('--source', choices=['docx', 'stream'], default='docx', help="paragraph source")
+    args = parser.parse_args(argv)
+
+    stem = os.path.splitext(os.path.basename(args.input))[0]
+    if args.code:
+        result, report = profile_call(build_code_zip, args.input, source=args.source)
+        files = [(f"{stem}_code_files.zip", result.getvalue())]
+    else:
+        result = io.BytesIO()
+        _, report = profile_call(convert_document, args.input, result, args.output_format,
+                                 source=args.source, mode=args.mode)
+        files = [(f"{stem}{OUTPUT_FORMATS[args.output_format].suffix}", result.getvalue())]
+
+    report.write_zip(args.output, files)
+    print(f"Profiled {args.input} in {report.seconds:.2f}s "
+          f"(peak traced memory {report.peak_bytes / 1e6:,.1f} MB) -> {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
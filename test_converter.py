@@ -1,7 +1,21 @@
 import os
+import csv
+import io
+import json
 import logging
+import subprocess
+import sys
+import tempfile
+import time
+from zipfile import ZIP_DEFLATED, ZipFile
 from docx import Document
-from converter import convert_word_to_excel
+from docx.enum.text import WD_BREAK
+from docx.oxml import OxmlElement
+from converter import (convert_document, convert_word_to_excel, extract_document_data,
+                       extract_document_data_parallel, extract_document_tables, extract_modes_data,
+                       iter_docx_paragraphs, iter_ooxml_paragraphs)
+from werkzeug.datastructures import FileStorage
+from validation import DocumentValidator, validate_document
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
@@ -48,6 +62,21 @@ def create_test_document():
     logger.info(f"Created test document: {test_path}")
     return test_path
 
+def create_solver_test_document():
+    """Creates a test document in the debug/solver layout with assert-based tests"""
+    doc = Document()
+    doc.add_paragraph("exid : SOLVE001")
+    doc.add_paragraph("title : Add Numbers")
+    doc.add_paragraph("description : Write a function add_numbers() that returns the sum")
+    doc.add_paragraph("of its two arguments.")
+    doc.add_paragraph("assert add_numbers(1, 2) == 3")
+    doc.add_paragraph("assert add_numbers(-1, 1) == 0")
+
+    test_path = "test_solver_document.docx"
+    doc.save(test_path)
+    logger.info(f"Created test document: {test_path}")
+    return test_path
+
 def verify_excel_output(excel_path):
     """Verify that the Excel file exists and has content"""
     if not os.path.exists(excel_path):
@@ -61,21 +90,672 @@ def verify_excel_output(excel_path):
     logger.info(f"Excel file verified: {excel_path}")
     return True
 
+def verify_ooxml_paragraphs():
+    """Verify that the streaming OOXML source yields the same text as python-docx"""
+    doc = Document()
+    run = doc.add_paragraph().add_run("name:")
+    run.add_tab()
+    run.add_text("value")
+    run = doc.add_paragraph().add_run("first line")
+    run.add_break()
+    run.add_text("second line")
+    run = doc.add_paragraph().add_run("before page break")
+    run.add_break(WD_BREAK.PAGE)
+    run.add_text("after page break")
+
+    # A hyperlink wraps its own runs inside the paragraph
+    paragraph = doc.add_paragraph("see ")
+    hyperlink = OxmlElement('w:hyperlink')
+    link_run = OxmlElement('w:r')
+    link_text = OxmlElement('w:t')
+    link_text.text = "the docs"
+    link_run.append(link_text)
+    hyperlink.append(link_run)
+    paragraph._p.append(hyperlink)
+    paragraph.add_run(" for details")
+
+    # Table paragraphs are not body paragraphs in either source
+    table = doc.add_table(rows=1, cols=2)
+    table.cell(0, 0).text = "exid : IN_TABLE"
+    table.cell(0, 1).text = "cell"
+    doc.add_paragraph("")
+    doc.add_paragraph("  indented  ")
+    docx_path = "output/ooxml_test.docx"
+    doc.save(docx_path)
+
+    expected = list(iter_docx_paragraphs(docx_path))
+    actual = list(iter_ooxml_paragraphs(docx_path))
+    if actual != expected:
+        logger.error(f"OOXML paragraphs differ from python-docx: {actual} vs {expected}")
+        return False
+    if "see the docs for details" not in actual or any("IN_TABLE" in text for text in actual):
+        logger.error(f"Unexpected paragraphs: {actual}")
+        return False
+
+    logger.info("OOXML paragraph source verified")
+    return True
+
+def verify_single_pass_extraction(docx_path):
+    """Verify that one pass over the document yields both sheets"""
+    sheet1_data, sheet2_data, code_blocks = extract_document_data(docx_path, include_code=True)
+
+    if len(sheet1_data) != 1 or sheet1_data[0][0] != "TEST001":
+        logger.error(f"Unexpected ex_data rows: {sheet1_data}")
+        return False
+
+    if [row[3] for row in sheet2_data] != ["radio", "checkbox", "number"]:
+        logger.error(f"Unexpected qa_data rows: {sheet2_data}")
+        return False
+
+    logger.info(f"Single-pass extraction verified ({len(code_blocks)} code blocks)")
+    return True
+
+def verify_parallel_extraction():
+    """Verify that parallel extraction matches the sequential pass, including carried-over fields"""
+    doc = Document()
+    for n in range(1, 5):
+        doc.add_paragraph(f"exid : PAR00{n}")
+        doc.add_paragraph(f"title : Exercise {n}")
+        if n % 2:
+            # Even exercises inherit these from the previous one
+            doc.add_paragraph(f"league : league {n}")
+            doc.add_paragraph(f"qlocation : par{n}.txt")
+        doc.add_paragraph("Code:")
+        doc.add_paragraph(f"print({n})")
+        doc.add_paragraph("Answer the following questions:")
+        doc.add_paragraph(f"What is printed? Answer: {n}")
+    docx_path = "output/parallel_test.docx"
+    doc.save(docx_path)
+
+    expected = extract_document_data(docx_path, include_code=True)
+    # One exid block per chunk, so every chunk boundary is checked
+    actual = extract_document_data_parallel(docx_path, 2, include_code=True, chunk_paragraphs=1)
+    if [list(rows) for rows in actual] != [list(rows) for rows in expected]:
+        logger.error(f"Parallel extraction differs: {actual} vs {expected}")
+        return False
+    if expected[0][1].league != "league 1":
+        logger.error(f"Field did not carry over: {expected[0][1]}")
+        return False
+
+    logger.info("Parallel extraction verified")
+    return True
+
+def verify_columnar_tables(docx_path):
+    """Verify that columnar tables hold the same rows as the record lists"""
+    sheet1_data, sheet2_data = extract_document_data(docx_path)
+    sheet1_table, sheet2_table = extract_document_tables(docx_path)
+
+    if list(sheet1_table) != sheet1_data or list(sheet2_table) != sheet2_data:
+        logger.error("Columnar tables differ from the extracted rows")
+        return False
+
+    if list(sheet2_table.column('key')) != [1, 2, 3]:
+        logger.error(f"Unexpected key column: {sheet2_table.column('key')}")
+        return False
+
+    # Integer columns hold 64-bit values and fall back to a list beyond that
+    from converter import exercise_table
+    table = exercise_table()
+    big_values = [3_000_000_000, 2 ** 70, 7]
+    for ex_seq in big_values:
+        table.append(sheet1_data[0]._replace(ex_seq=ex_seq))
+    if [row.ex_seq for row in table] != big_values or [row.exid for row in table] != ["TEST001"] * 3:
+        logger.error(f"Large ex_seq values not stored: {list(table)}")
+        return False
+
+    logger.info("Columnar tables verified")
+    return True
+
+def verify_output_formats(docx_path):
+    """Verify that the CSV and JSON Lines outputs hold the same rows as the workbook"""
+    sheet1_data, sheet2_data = extract_document_data(docx_path)
+
+    csv_zip = io.BytesIO()
+    convert_document(docx_path, csv_zip, 'csv')
+    with ZipFile(csv_zip) as zipf:
+        qa_csv = list(csv.reader(io.StringIO(zipf.read('qa_data.csv').decode('utf-8'))))
+    if len(qa_csv) != len(sheet2_data) + 1 or qa_csv[1][2] != sheet2_data[0][2]:
+        logger.error(f"Unexpected qa_data.csv rows: {qa_csv}")
+        return False
+
+    jsonl_zip = io.BytesIO()
+    convert_document(docx_path, jsonl_zip, 'jsonl')
+    with ZipFile(jsonl_zip) as zipf:
+        ex_jsonl = [json.loads(line) for line in zipf.read('ex_data.jsonl').decode('utf-8').splitlines()]
+    if [tuple(row.values()) for row in ex_jsonl] != [tuple(row) for row in sheet1_data]:
+        logger.error(f"Unexpected ex_data.jsonl rows: {ex_jsonl}")
+        return False
+
+    logger.info("Output formats verified")
+    return True
+
+def verify_database_load(docx_path):
+    """Verify that loading a document twice into SQLite replaces its rows instead of duplicating them"""
+    import sqlite3
+    from database import load_document
+
+    db_path = "output/test_output.db"
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    sheet1_data, sheet2_data = extract_document_data(docx_path)
+    for _ in range(2):
+        load_document(docx_path, f"sqlite:///{db_path}")
+
+    with sqlite3.connect(db_path) as connection:
+        ex_count, = connection.execute("SELECT COUNT(*) FROM ex_data").fetchone()
+        qa_rows = connection.execute("SELECT exid, key, question FROM qa_data ORDER BY key").fetchall()
+    if ex_count != len(sheet1_data) or qa_rows != [tuple(row[:3]) for row in sheet2_data]:
+        logger.error(f"Unexpected database rows: {ex_count} exercises, {qa_rows}")
+        return False
+
+    # Re-loading an exercise whose questions were all removed deletes the stored ones
+    for questions in (["Why? Answer: 1"], []):
+        doc = Document()
+        for text in ["exid : A1", "title : One", "description : First", "ex_seq : 3000000000"] + questions:
+            doc.add_paragraph(text)
+        doc.save("output/database_reload.docx")
+        load_document("output/database_reload.docx", f"sqlite:///{db_path}")
+    with sqlite3.connect(db_path) as connection:
+        stale = connection.execute("SELECT exid, key, question FROM qa_data WHERE exid = 'A1'").fetchall()
+        ex_seq, = connection.execute("SELECT ex_seq FROM ex_data WHERE exid = 'A1'").fetchone()
+    if ex_seq != 3_000_000_000:
+        logger.error(f"64-bit ex_seq not stored: {ex_seq}")
+        return False
+    if stale:
+        logger.error(f"Removed questions still stored: {stale}")
+        return False
+
+    logger.info("Database load verified")
+    return True
+
+def verify_stage_timings(docx_path):
+    """Verify that a timed conversion records each stage and exposes it as histograms"""
+    from metrics import render_metrics, timed_conversion
+
+    with timed_conversion(os.path.getsize(docx_path)) as timings:
+        convert_document(docx_path, io.BytesIO(), 'xlsx')
+
+    expected = ['docx_open', 'paragraph_iteration', 'ex_data_extraction', 'qa_data_extraction', 'workbook_write']
+    if list(timings.seconds) != expected or timings.paragraphs == 0:
+        logger.error(f"Unexpected stage timings: {timings.seconds} ({timings.paragraphs} paragraphs)")
+        return False
+
+    if 'conversion_stage_seconds_count{stage="workbook_write"}' not in render_metrics():
+        logger.error("Stage timings missing from the metrics output")
+        return False
+
+    # Stage memory is the current RSS, which falls again once a large allocation is freed
+    from metrics import current_rss_bytes
+    if current_rss_bytes() is not None:
+        before = current_rss_bytes()
+        block = b'x' * (64 * 1024 * 1024)
+        during = current_rss_bytes()
+        del block
+        if during - before < 32 * 1024 * 1024 or during - current_rss_bytes() < 32 * 1024 * 1024:
+            logger.error("Unexpected resident memory readings around a 64 MB allocation")
+            return False
+
+    logger.info("Stage timings verified")
+    return True
+
+def verify_profiling(docx_path):
+    """Verify that a profiled conversion bundles its result with the profile and allocation sites"""
+    from profiling import profile_call
+
+    output = io.BytesIO()
+    _, report = profile_call(convert_document, docx_path, output, 'xlsx')
+    bundle = io.BytesIO()
+    report.write_zip(bundle, [("test_output.xlsx", output.getvalue())])
+
+    with ZipFile(bundle) as zipf:
+        names = zipf.namelist()
+        profile_text = zipf.read('profile.txt').decode('utf-8')
+    if names != ['test_output.xlsx', 'profile.pstats', 'profile.txt', 'allocations.txt']:
+        logger.error(f"Unexpected profile bundle: {names}")
+        return False
+    if 'convert_document' not in profile_text:
+        logger.error("convert_document missing from the profile")
+        return False
+
+    logger.info("Profiling verified")
+    return True
+
+def verify_admission(docx_path):
+    """Verify cost estimates, zip-bomb rejection and the memory budget of the admission controller"""
+    from admission import AdmissionController, AdmissionTimeout, DocumentTooLarge, estimate_cost
+
+    cost = estimate_cost(docx_path)
+    if not cost.document_xml_bytes or cost.memory_bytes <= cost.compressed_bytes:
+        logger.error(f"Unexpected cost estimate: {cost}")
+        return False
+
+    bomb = io.BytesIO()
+    with ZipFile(bomb, 'w', ZIP_DEFLATED) as zipf:
+        zipf.writestr('word/document.xml', b' ' * (8 * 1024 * 1024))
+    try:
+        estimate_cost(bomb)
+        logger.error("Zip bomb was not rejected")
+        return False
+    except DocumentTooLarge:
+        pass
+
+    controller = AdmissionController(budget_bytes=100, queue_seconds=0.05)
+    with controller.admit(60):
+        try:
+            controller.acquire(60)
+            logger.error("Conversion over the memory budget was admitted")
+            return False
+        except AdmissionTimeout:
+            pass
+    with controller.admit(60):
+        pass
+    if controller.stats()['admitted'] != 2 or controller.stats()['in_flight_bytes'] != 0:
+        logger.error(f"Unexpected admission stats: {controller.stats()}")
+        return False
+
+    # Other processes on the same ledger draw on the same budget
+    holder = subprocess.Popen(
+        [sys.executable, '-c', "import sys; from admission import AdmissionController; "
+         "AdmissionController(100, ledger_path=sys.argv[1]).acquire(60); print('held', flush=True); sys.stdin.read()",
+         controller.ledger_path],
+        cwd=os.path.dirname(os.path.abspath(__file__)), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL, text=True)
+    try:
+        holder.stdout.readline()
+        try:
+            controller.acquire(60)
+            logger.error("Conversion over the budget held by another process was admitted")
+            return False
+        except AdmissionTimeout:
+            pass
+    finally:
+        holder.stdin.close()
+        holder.wait()
+    # A process that exits without releasing its reservation gives it back
+    with controller.admit(60):
+        pass
+
+    # Background jobs wait in line for the same budget
+    from jobs import JobQueue
+    controller = AdmissionController(budget_bytes=cost.memory_bytes, queue_seconds=0.05)
+    queue = JobQueue(max_workers=1, admission=controller)
+    try:
+        ticket = controller.acquire(cost.memory_bytes)
+        with open(docx_path, 'rb') as f:
+            job = queue.submit('excel', FileStorage(f, 'test.docx'), 'test.xlsx')
+        time.sleep(0.3)
+        if queue.get(job.id).status != 'queued':
+            logger.error("Job started while the memory budget was in use")
+            return False
+        controller.release(ticket)
+        job = wait_for_job(queue, job.id)
+        if job is None or job.status != 'done' or controller.stats()['admitted'] != 2:
+            logger.error(f"Job was not admitted: {job and job.to_dict()}, {controller.stats()}")
+            return False
+    finally:
+        queue.shutdown()
+
+    logger.info("Admission control verified")
+    return True
+
+def wait_for_job(queue, job_id, timeout=30):
+    deadline = time.time() + timeout
+    job = queue.get(job_id)
+    while job is not None and not job.finished and time.time() < deadline:
+        time.sleep(0.05)
+        job = queue.get(job_id)
+    return job
+
+def verify_job_queue(docx_path):
+    """Verify that queued jobs run, are visible to another queue on the same directory, and expire"""
+    from jobs import Job, JobQueue, JobQueueFull
+
+    work_dir = tempfile.mkdtemp()
+    queue = JobQueue(max_workers=1, max_pending=2, ttl=3600, work_dir=work_dir)
+    try:
+        with open(docx_path, 'rb') as f:
+            job = queue.submit('excel', FileStorage(f, 'test.docx'), 'test.xlsx')
+        job = wait_for_job(queue, job.id)
+        if job is None or job.status != 'done' or not os.path.exists(job.output_path):
+            logger.error(f"Job did not finish: {job and job.to_dict()}")
+            return False
+
+        # Another worker process sees the job through its state file
+        other = JobQueue(work_dir=work_dir).get(job.id)
+        if other is None or other.status != 'done' or other.download_name != 'test.xlsx':
+            logger.error(f"Job state not shared: {other and other.to_dict()}")
+            return False
+
+        full = JobQueue(max_pending=0, work_dir=tempfile.mkdtemp(dir=work_dir))
+        try:
+            with open(docx_path, 'rb') as f:
+                full.submit('excel', FileStorage(f, 'test.docx'), 'test.xlsx')
+            logger.error("Full job queue accepted a job")
+            return False
+        except JobQueueFull:
+            pass
+
+        # Jobs left unfinished by a worker process that has exited are failed
+        exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+        exited.wait()
+        orphan = Job('excel', work_dir, 'orphan.xlsx')
+        orphan.status, orphan.pid = 'running', exited.pid
+        orphan.save(os.path.join(work_dir, f"{orphan.id}.json"))
+        orphan = queue.get(orphan.id)
+        if orphan is None or orphan.status != 'failed' or not orphan.error:
+            logger.error(f"Orphaned job not failed: {orphan and orphan.to_dict()}")
+            return False
+
+        # So are jobs past the runtime limit
+        stuck = Job('excel', work_dir, 'stuck.xlsx')
+        stuck.status, stuck.created_at = 'queued', time.time() - 7200
+        stuck.save(os.path.join(work_dir, f"{stuck.id}.json"))
+        if queue.get(stuck.id).status != 'failed':
+            logger.error("Job past the runtime limit not failed")
+            return False
+
+        queue.ttl = -1
+        queue.expire()
+        if queue.get(job.id) is not None or os.path.exists(job.output_path):
+            logger.error("Finished job was not expired")
+            return False
+    finally:
+        queue.shutdown()
+
+    logger.info("Job queue verified")
+    return True
+
+def verify_batch(docx_path):
+    """Verify merged batches reject duplicate exids, per-file zips keep every document and zip bombs are refused"""
+    from admission import DocumentTooLarge
+    from batch import DuplicateExidError, convert_batch, extract_docx_files_from_zip
+
+    work_dir = tempfile.mkdtemp(dir="output")
+    copies = []
+    for n in range(2):
+        copy_dir = os.path.join(work_dir, str(n))
+        os.makedirs(copy_dir)
+        copies.append(os.path.join(copy_dir, "chapter.docx"))
+        with open(docx_path, 'rb') as src, open(copies[-1], 'wb') as dst:
+            dst.write(src.read())
+
+    try:
+        convert_batch(copies, os.path.join(work_dir, "merged.xlsx"), max_workers=2)
+        logger.error("Merged batch with duplicate exids was accepted")
+        return False
+    except DuplicateExidError as e:
+        if [exid for exid, _ in e.duplicates] != ["TEST001"]:
+            logger.error(f"Unexpected duplicates: {e.duplicates}")
+            return False
+
+    per_file = os.path.join(work_dir, "per_file.zip")
+    stats = convert_batch(copies, per_file, merge=False, max_workers=2)
+    with ZipFile(per_file) as zipf:
+        names = zipf.namelist()
+    if stats['documents'] != 2 or sorted(names) != ["chapter.xlsx", "chapter_2.xlsx"]:
+        logger.error(f"Unexpected per-file batch: {stats}, {names}")
+        return False
+
+    bomb = os.path.join(work_dir, "bomb.zip")
+    with ZipFile(bomb, 'w', ZIP_DEFLATED) as zipf:
+        zipf.writestr('huge.docx', b' ' * (8 * 1024 * 1024))
+    try:
+        extract_docx_files_from_zip(bomb, work_dir)
+        logger.error("Zip bomb was extracted")
+        return False
+    except DocumentTooLarge:
+        pass
+    if os.path.exists(os.path.join(work_dir, "huge.docx")):
+        logger.error("Zip bomb member was written before it was rejected")
+        return False
+
+    logger.info("Batch conversion verified")
+    return True
+
+def verify_result_cache():
+    """Verify that the result cache expires entries by TTL and evicts the least recently used first"""
+    from cache import ResultCache
+
+    cache = ResultCache(tempfile.mkdtemp(dir="output"), max_bytes=250, ttl=60)
+
+    def cached(key):
+        entry = cache.get(key)
+        if entry is not None:
+            entry.close()
+        return entry is not None
+
+    for key in ('a', 'b'):
+        cache.put_bytes(key, b'x' * 100)
+        time.sleep(0.01)
+    # Serving 'a' makes 'b' the least recently used entry
+    cached('a')
+    time.sleep(0.01)
+    cache.put_bytes('c', b'x' * 100)
+    if cached('b') or not cached('a') or not cached('c'):
+        logger.error(f"Unexpected LRU eviction: {sorted(os.listdir(cache.directory))}")
+        return False
+
+    # Entries stored longer than the TTL ago are misses and are deleted
+    path = os.path.join(cache.directory, 'a')
+    stored = time.time() - 120
+    os.utime(path, (stored, stored))
+    if cached('a') or os.path.exists(path):
+        logger.error("Expired cache entry was served")
+        return False
+
+    # An entry evicted by another worker after it was looked up is still served in full
+    with cache.get('c') as entry:
+        os.unlink(os.path.join(cache.directory, 'c'))
+        if entry.read() != b'x' * 100:
+            logger.error("Evicted cache entry was cut short")
+            return False
+    if cached('c'):
+        logger.error("Evicted cache entry was served")
+        return False
+    if cache.stats() != {'hits': 4, 'misses': 3}:
+        logger.error(f"Unexpected cache stats: {cache.stats()}")
+        return False
+
+    logger.info("Result cache verified")
+    return True
+
+def create_block_cache_document(path, title, question):
+    """Saves a three-exercise document whose second exercise has the given title and question"""
+    doc = Document()
+    for n in range(1, 4):
+        doc.add_paragraph(f"exid : BLOCK00{n}")
+        if n != 3:
+            # The third exercise inherits the second one's title
+            doc.add_paragraph(f"title : {title if n == 2 else 'First'}")
+        doc.add_paragraph("Answer the following questions:")
+        doc.add_paragraph(f"{question if n == 2 else 'Why?'} Answer: {n}")
+    doc.save(path)
+    return path
+
+def verify_block_cache():
+    """Verify that re-converting a changed document reuses unchanged blocks and yields fresh rows"""
+    from openpyxl import load_workbook
+    from cache import BlockCache
+    from converter import extract_document_data_incremental
+
+    block_cache = BlockCache(max_bytes=1024 * 1024)
+    docx_path = create_block_cache_document("output/block_cache_test.docx", "Second", "How?")
+    # Each case: (title, question) of the second exercise, expected (reused, reparsed)
+    cases = [
+        (("Second", "How?"), (0, 3)),
+        # Only the second block's question changed
+        (("Second", "What?"), (2, 1)),
+        # The title carries over, so the third block is re-parsed too
+        (("Renamed", "What?"), (1, 2)),
+    ]
+    for (title, question), expected in cases:
+        create_block_cache_document(docx_path, title, question)
+        data, stats = extract_document_data_incremental(docx_path, block_cache)
+        if [list(rows) for rows in data] != [list(rows) for rows in extract_document_data(docx_path)]:
+            logger.error(f"Incremental rows differ for {title!r}/{question!r}: {data}")
+            return False
+        if (stats['reused'], stats['reparsed']) != expected:
+            logger.error(f"Unexpected block reuse for {title!r}/{question!r}: {stats}")
+            return False
+    if data[0][2].title != "Renamed" or data[1][1].question != "What?":
+        logger.error(f"Stale rows reassembled from the block cache: {data}")
+        return False
+
+    # Cached rows stream into the workbook writer
+    output = io.BytesIO()
+    if not convert_document(docx_path, output, block_cache=block_cache):
+        return False
+    workbook = load_workbook(output)
+    if workbook['ex_data'].max_row != 4 or workbook['qa_data'].max_row != 4:
+        logger.error("Block-cached conversion wrote unexpected rows")
+        return False
+
+    # The cache stays within its memory budget
+    small_cache = BlockCache(max_bytes=5000)
+    extract_document_data_incremental(docx_path, small_cache)
+    if small_cache.total_bytes > small_cache.max_bytes or not small_cache.entries:
+        logger.error(f"Block cache over budget: {small_cache.total_bytes} bytes")
+        return False
+
+    logger.info("Block cache verified")
+    return True
+
+def post_upload(client, docx_path, filename, **fields):
+    with open(docx_path, 'rb') as f:
+        return client.post('/upload', data=dict(fields, file=(f, filename)),
+                           content_type='multipart/form-data')
+
+def verify_upload_cache(docx_path):
+    """Verify that /upload serves repeated uploads from the result cache under the right names"""
+    import app as app_module
+    from app import app, result_cache
+
+    # Cache hits are served without re-parsing the upload to validate it
+    validations = []
+    find_document_issues = app_module.find_document_issues
+    def counting_find_document_issues(upload, modes):
+        validations.append(modes)
+        return find_document_issues(upload, modes)
+
+    result_cache.directory = tempfile.mkdtemp(dir="output")
+    client = app.test_client()
+    app_module.find_document_issues = counting_find_document_issues
+    try:
+        for filename in ('first.docx', 'second.docx', 'second.docx'):
+            response = post_upload(client, docx_path, filename, mode='reader,debug')
+            name = os.path.splitext(filename)[0]
+            with ZipFile(io.BytesIO(response.data)) as zipf:
+                names = sorted(zipf.namelist())
+            if response.status_code != 200 or names != [f"{name}_debug.xlsx", f"{name}_reader.xlsx"]:
+                logger.error(f"Unexpected members for {filename}: {response.status_code} {names}")
+                return False
+    finally:
+        app_module.find_document_issues = find_document_issues
+    if result_cache.stats()['hits'] != 1 or len(validations) != 2:
+        logger.error(f"Unexpected upload cache stats: {result_cache.stats()}, {len(validations)} validations")
+        return False
+
+    logger.info("Upload result cache verified")
+    return True
+
+def verify_conversion_modes(docx_path):
+    """Verify that one parse feeds the reader, debug and solver modes"""
+    data = extract_modes_data(docx_path, ['reader', 'debug', 'solver'])
+
+    debug_ex, debug_qa = data['debug']
+    if debug_ex[0][:3] != ("SOLVE001", "Add Numbers",
+                           "Write a function add_numbers() that returns the sum\nof its two arguments."):
+        logger.error(f"Unexpected debug ex_data rows: {debug_ex}")
+        return False
+
+    if [row[2] for row in debug_qa] != ["Add Numbers"] * 2:
+        logger.error(f"Unexpected debug qa_data rows: {debug_qa}")
+        return False
+
+    solver_ex, solver_qa = data['solver']
+    if solver_ex[0][1] != "" or [row[2] for row in solver_qa] != ["add_numbers"] * 2:
+        logger.error(f"Unexpected solver rows: {solver_ex} {solver_qa}")
+        return False
+
+    logger.info("Conversion modes verified")
+    return True
+
+def verify_question_lines():
+    """Verify delimiters inside question text, hints and dropping of ambiguous answers"""
+    from converter import Question, QuestionExtractor
+
+    extractor = QuestionExtractor()
+    for text in ["exid : Q1",
+                 "What do Options: and Answer: mean? Options: labels,fields answer: 2 Hint: see the intro",
+                 "Is 'Answer:' a keyword? Answer: no Hint: it is a label",
+                 "Bad Options: a,b answer: 1 answer: 2",
+                 "Answer: 3.5"]:
+        extractor.feed(text)
+    expected = [
+        Question("Q1", 1, "What do Options: and Answer: mean?", "radio", "labels,fields", 2, "see the intro"),
+        Question("Q1", 2, "Is 'Answer:' a keyword?", "text", "", "no", "it is a label"),
+        Question("Q1", 3, "", "number", "", 3.5, ""),
+    ]
+    if extractor.finish() != expected:
+        logger.error(f"Unexpected question rows: {extractor.rows}")
+        return False
+
+    validator = DocumentValidator()
+    for text in ["exid : Q1", "title : One", "description : First", "Bad Options: a,b answer: 1 answer: 2"]:
+        validator.feed(text)
+    codes = [(issue.paragraph, issue.code) for issue in validator.finish()]
+    if codes != [(4, 'question_syntax')]:
+        logger.error(f"Ambiguous answer not reported: {codes}")
+        return False
+
+    logger.info("Question lines verified")
+    return True
+
+def verify_validation(docx_path):
+    """Verify that a clean document passes validation and broken lines are reported"""
+    issues = validate_document(docx_path)
+    if issues:
+        logger.error(f"Unexpected validation issues: {issues}")
+        return False
+
+    validator = DocumentValidator()
+    for text in ["exid : A1", "title : One", "description : First", "Pick one Options: x,y answer: 3",
+                 "exid : A1", "level : high"]:
+        validator.feed(text)
+    codes = [(issue.paragraph, issue.code) for issue in validator.finish()]
+    expected = [(4, 'question_syntax'), (5, 'duplicate_exid'), (5, 'missing_field'), (6, 'invalid_integer')]
+    if codes != expected:
+        logger.error(f"Unexpected validation issues: {codes}")
+        return False
+
+    logger.info("Validation verified")
+    return True
+
 def main():
     try:
         # Create output directory if it doesn't exist
         if not os.path.exists("output"):
             os.makedirs("output")
 
-        # Create and process test document
+        # Create and process test documents
         test_doc = create_test_document()
+        solver_doc = create_solver_test_document()
         logger.info(f"Test document created: {test_doc}")
 
         # Convert to Excel
         output_excel = "output/test_output.xlsx"
         success = convert_word_to_excel(test_doc, output_excel)
 
-        if success and verify_excel_output(output_excel):
+        if (success and verify_excel_output(output_excel) and verify_ooxml_paragraphs()
+                and verify_single_pass_extraction(test_doc)
+                and verify_parallel_extraction()
+                and verify_columnar_tables(test_doc) and verify_output_formats(test_doc)
+                and verify_database_load(test_doc) and verify_stage_timings(test_doc)
+                and verify_profiling(test_doc) and verify_admission(test_doc) and verify_job_queue(test_doc)
+                and verify_batch(test_doc) and verify_result_cache() and verify_block_cache()
+                and verify_upload_cache(test_doc)
+                and verify_conversion_modes(solver_doc)
+                and verify_question_lines() and verify_validation(test_doc)):
             logger.info("Test completed successfully")
             logger.info(f"Output file: {output_excel}")
         else:
@@ -84,10 +764,11 @@ def main():
     except Exception as e:
         logger.error(f"Test failed with error: {str(e)}")
     finally:
-        # Clean up test document
-        if os.path.exists(test_doc):
-            os.remove(test_doc)
-            logger.info("Test document cleaned up")
+        # Clean up test documents
+        for path in (test_doc, solver_doc):
+            if os.path.exists(path):
+                os.remove(path)
+        logger.info("Test documents cleaned up")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
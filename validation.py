@@ -0,0 +1,149 @@
+import logging
+from collections import namedtuple
+from converter import FIELD_COERCIONS, _to_int, iter_paragraphs, parse_field_directive, parse_question_line
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# One problem found in a document; paragraph numbers start at 1
+ValidationIssue = namedtuple('ValidationIssue', ['paragraph', 'exid', 'code', 'message'])
+
+# Fields every exercise must define within its own exid block, per conversion mode
+REQUIRED_FIELDS = {
+    'reader': ('title', 'description'),
+    'debug': ('title', 'description'),
+    'solver': ('description',),
+}
+
+# Stop validating once this many issues have been found
+DEFAULT_MAX_ERRORS = 20
+
+class DocumentValidator:
+    """Checks a stream of paragraph texts for problems that would silently lose data.
+
+    Reports duplicate or empty exids, exercises missing a required field,
+    non-integer values in integer fields and, in reader mode, question lines
+    whose Options/answer or Answer syntax cannot be parsed. Validating for
+    several ``modes`` applies the checks of each of them.
+    """
+
+    def __init__(self, modes=('reader',), max_errors=DEFAULT_MAX_ERRORS):
+        required_fields = {}
+        for mode in modes:
+            if mode not in REQUIRED_FIELDS:
+                raise ValueError(f"Unknown conversion mode: {mode}")
+            required_fields.update(dict.fromkeys(REQUIRED_FIELDS[mode]))
+        self.required_fields = tuple(required_fields)
+        self.check_questions = 'reader' in modes
+        self.max_errors = max_errors
+        self.issues = []
+        self.paragraph = 0
+        self.seen_exids = {}
+        self.exid = None
+        self.exid_paragraph = 0
+        self.defined_fields = set()
+
+    @property
+    def exhausted(self):
+        """Whether the error budget has been used up"""
+        return bool(self.max_errors) and len(self.issues) >= self.max_errors
+
+    def feed(self, raw_text):
+        self.paragraph += 1
+        text = raw_text.strip()
+        directive = parse_field_directive(text)
+
+        if directive is not None:
+            field, value = directive
+            if field == 'exid':
+                self._close_exercise()
+                self._start_exercise(value)
+            else:
+                self.defined_fields.add(field)
+                if FIELD_COERCIONS[field] is _to_int:
+                    try:
+                        int(text.partition(" :")[2].strip())
+                    except ValueError:
+                        self._report('invalid_integer', f"{field} must be a whole number: {text}")
+        elif self.check_questions:
+            self._check_question(text)
+
+    def finish(self):
+        self._close_exercise()
+        self.issues.sort(key=lambda issue: issue.paragraph)
+        return self.issues
+
+    def _start_exercise(self, exid):
+        self.exid = exid
+        self.exid_paragraph = self.paragraph
+        self.defined_fields = set()
+        if not exid:
+            self._report('empty_exid', "exid has no value")
+        elif exid in self.seen_exids:
+            self._report('duplicate_exid',
+                         f"Duplicate exid {exid} (first defined at paragraph {self.seen_exids[exid]})")
+        else:
+            self.seen_exids[exid] = self.paragraph
+
+    def _close_exercise(self):
+        if self.exid is None:
+            return
+        missing = [field for field in self.required_fields if field not in self.defined_fields]
+        if missing:
+            self._report('missing_field', f"Exercise {self.exid} has no {', '.join(missing)}",
+                         paragraph=self.exid_paragraph)
+
+    def _check_question(self, text):
+        if text.startswith("Answer the following questions:"):
+            return
+
+        try:
+            tokens = parse_question_line(text)
+        except ValueError as e:
+            self._report('question_syntax', f"{str(e)} in: {text}")
+            return
+        if tokens is None:
+            if "Options:" in text:
+                self._report('question_syntax', f"Options: without answer: in: {text}")
+            return
+
+        _, options, answer, answer_type, _ = tokens
+        if answer == "":
+            self._report('question_syntax', f"Empty answer in: {text}")
+        elif options:
+            # Numeric answers are 1-based option numbers; other answers are kept as text
+            choices = answer.split(',') if answer_type == "checkbox" else [str(answer)]
+            for choice in choices:
+                choice = choice.strip()
+                if not choice:
+                    self._report('question_syntax', f"Empty choice in answer in: {text}")
+                    return
+                if choice.isdigit() and not 1 <= int(choice) <= len(options):
+                    self._report('question_syntax',
+                                 f"Answer {choice} is not an option number between 1 and {len(options)} in: {text}")
+                    return
+
+        if self.exid is None:
+            self._report('question_outside_exercise', f"Question before the first exid: {text}")
+
+    def _report(self, code, message, paragraph=None):
+        if self.exhausted:
+            return
+        self.issues.append(ValidationIssue(paragraph or self.paragraph, self.exid, code, message))
+
+
+def validate_document(docx_path, modes=('reader',), max_errors=DEFAULT_MAX_ERRORS, source='stream'):
+    """Validate a document and return its ``ValidationIssue`` list.
+
+    Reading stops as soon as ``max_errors`` issues are found (``0`` means no
+    limit), so badly broken uploads are rejected without parsing the rest.
+    The default ``stream`` source reads word/document.xml incrementally.
+    """
+    validator = DocumentValidator(modes, max_errors)
+    for text in iter_paragraphs(docx_path, source):
+        validator.feed(text)
+        if validator.exhausted:
+            logger.info(f"Validation stopped at paragraph {validator.paragraph} after {max_errors} issues")
+            return sorted(validator.issues, key=lambda issue: issue.paragraph)
+    return validator.finish()